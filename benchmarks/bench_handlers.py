@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# End-to-end latency and throughput benchmarks for the puzzle handlers.
+#
+# Each challenge runs in its own subprocess on the simulated hardware backend, with its OSC
+# output pointed at a local UDP listener. Results are written as JSON and can be compared
+# against a previous run:
+#
+#   python benchmarks/bench_handlers.py --output bench.json
+#   python benchmarks/bench_handlers.py --baseline bench.json
+import argparse, json, logging, os, platform, resource, socket, subprocess, sys, tempfile, threading, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "escape-room"))
+os.environ["ESCAPEROOM_BACKEND"] = "sim"
+
+
+class Listener():
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.messages:list[tuple[int, str, list]] = []
+        self.condition = threading.Condition()
+
+        threading.Thread(target=self.__run, name="BenchListener", daemon=True).start()
+
+    def __run(self):
+        from pythonosc.osc_packet import OscPacket
+        while True:
+            data = self.socket.recv(65535)
+            received = time.monotonic_ns()
+            with self.condition:
+                for timed in OscPacket(data).messages:
+                    self.messages.append((received, timed.message.address, timed.message.params))
+                self.condition.notify_all()
+
+    def wait_for(self, address: str, after_ns: int, timeout: float = 2.0, count: int = 1) -> list[int]:
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                found = [t for t, a, _ in self.messages if a == address and t >= after_ns]
+                if len(found) >= count or time.monotonic() >= deadline:
+                    return found[:count]
+                self.condition.wait(deadline - time.monotonic())
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def summarize(samples_ns: list[int], expected: int) -> dict:
+    samples = sorted(samples_ns)
+    if not samples:
+        return {"count": 0, "expected": expected}
+
+    def percentile(p: float) -> float:
+        return samples[min(len(samples) - 1, int(round(p * (len(samples) - 1))))] / 1e6
+
+    return {
+        "count": len(samples),
+        "expected": expected,
+        "p50_ms": round(percentile(0.50), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "max_ms": round(samples[-1] / 1e6, 3),
+    }
+
+
+def thread_count() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+class Scenario():
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.monotonic()
+        self.usage = resource.getrusage(resource.RUSAGE_SELF)
+        return self
+
+    def __exit__(self, *exc):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        wall = time.monotonic() - self.wall
+        cpu = (usage.ru_utime - self.usage.ru_utime) + (usage.ru_stime - self.usage.ru_stime)
+        self.resources = {
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "cpu_percent": round(100 * cpu / wall, 1) if wall else 0,
+            "threads": thread_count(),
+        }
+
+
+def start_handler(module, listener: Listener):
+    rx_port = free_port()
+    module.CONFIG.update(
+        osc_rx_server_ip="127.0.0.1", osc_rx_server_port=rx_port,
+        osc_tx_client_ip="127.0.0.1", osc_tx_client_port=listener.port,
+        state_dir=tempfile.mkdtemp(prefix="escaperoom-bench-"),
+    )
+    handler = module.Handler()
+    threading.Thread(target=handler.run, name="BenchHandler", daemon=True).start()
+    time.sleep(0.3)
+
+    from pythonosc.udp_client import SimpleUDPClient
+    return handler, SimpleUDPClient("127.0.0.1", rx_port)
+
+
+def bench_challenge4(args) -> dict:
+    import challenge4, sim
+    from sim import GPIO
+
+    wires = challenge4.CONFIG["defuse_wires"]
+    wrong = next(wire["pin"] for wire in wires if not wire["needs_cutting"])
+    settle = challenge4.CONFIG["debounce"]["defuse_wires"] + 0.05
+
+    for wire in wires:
+        GPIO.inject(wire["pin"], 1)
+
+    listener = Listener()
+    handler, client = start_handler(challenge4, listener)
+    keypad = sim.SimKeypadFactory.keypads[-1]
+    results = {}
+
+    with Scenario("wirecut_to_failure") as scenario:
+        samples = []
+        for _ in range(args.iterations):
+            GPIO.inject(wrong, 1)
+            client.send_message("/escaperoom/challenge/4/reset", 1)
+            time.sleep(settle)
+
+            start = time.monotonic_ns()
+            GPIO.inject(wrong, 0)
+            found = listener.wait_for("/escaperoom/challenge/4/failure", start)
+            samples += [found[0] - start] if found else []
+            time.sleep(settle)
+    results[scenario.name] = {**summarize(samples, args.iterations), **scenario.resources}
+
+    with Scenario("keypad_to_success") as scenario:
+        samples = []
+        handler.keypad_started = True
+        code = str(challenge4.CONFIG["keypad_correct_code"]).zfill(4)
+        for _ in range(args.iterations):
+            handler.keypad_finished = False
+            handler.keypad_input = ""
+            keypad.type(code[:3])
+            time.sleep(0.01)
+
+            start = time.monotonic_ns()
+            keypad.press(code[3])
+            found = listener.wait_for("/escaperoom/challenge/4/success", start)
+            samples += [found[0] - start] if found else []
+    results[scenario.name] = {**summarize(samples, args.iterations), **scenario.resources}
+
+    # With a wrong wire cut, every reset re-evaluates the wires and sends /failure straight
+    # back, which gives a reset round trip that can be driven at increasing rates
+    with Scenario("reset_storm") as scenario:
+        GPIO.inject(wrong, 0)
+        time.sleep(settle)
+
+        rates = {}
+        best = 0
+        for rate in args.reset_rates:
+            start = time.monotonic_ns()
+            for index in range(args.burst):
+                client.send_message("/escaperoom/challenge/4/reset", 1)
+                time.sleep(max(0.0, start / 1e9 + (index + 1) / rate - time.monotonic()))
+
+            found = listener.wait_for("/escaperoom/challenge/4/failure", start, timeout=2.0, count=args.burst)
+            sent_at = [start + int(index * 1e9 / rate) for index in range(len(found))]
+            rates[str(rate)] = {
+                **summarize([received - sent for received, sent in zip(found, sent_at)], args.burst),
+                "dropped": args.burst - len(found),
+            }
+            if len(found) == args.burst:
+                best = rate
+            time.sleep(0.2)
+    results[scenario.name] = {"rates": rates, "events_per_second_before_drops": best, **scenario.resources}
+
+    return results
+
+
+def bench_challenge1(args) -> dict:
+    import challenge1
+    from sim import GPIO
+
+    breakers = challenge1.CONFIG["circuit_breakers"]
+    valid = [breaker["pin"] for breaker in breakers if breaker["valid_state"]]
+    settle = challenge1.CONFIG["debounce"]["circuit_breakers"] + 0.05
+
+    for breaker in breakers:
+        GPIO.inject(breaker["pin"], 0)
+
+    listener = Listener()
+    handler, client = start_handler(challenge1, listener)
+    results = {}
+
+    with Scenario("breaker_to_success") as scenario:
+        success, leds = [], []
+        for _ in range(args.iterations):
+            for pin in valid:
+                GPIO.inject(pin, 0)
+            client.send_message("/escaperoom/challenge/1/reset", 1)
+            time.sleep(settle)
+            for pin in valid[:-1]:
+                GPIO.inject(pin, 1)
+            time.sleep(settle)
+
+            start = time.monotonic_ns()
+            GPIO.inject(valid[-1], 1)
+            found = listener.wait_for("/escaperoom/challenge/1/success", start)
+            success += [found[0] - start] if found else []
+
+            led_changes = [t for t, pin, _ in list(GPIO.output_log) if pin in challenge1.CONFIG["leds"] and t >= start]
+            leds += [min(led_changes) - start] if led_changes else []
+    results[scenario.name] = {**summarize(success, args.iterations), **scenario.resources}
+    results["breaker_to_led"] = summarize(leds, args.iterations)
+
+    return results
+
+
+WORKERS = {
+    "1": bench_challenge1,
+    "4": bench_challenge4,
+}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for challenge, scenarios in results["challenges"].items():
+        for name, result in scenarios.items():
+            before = baseline.get("challenges", {}).get(challenge, {}).get(name, {})
+            for metric in ("p50_ms", "p99_ms", "max_ms"):
+                if metric in result and metric in before and before[metric] > 0:
+                    ratio = result[metric] / before[metric]
+                    print(f"challenge {challenge} {name} {metric}: {before[metric]} -> {result[metric]} ({ratio:.2f}x)")
+                    if ratio > 1 + tolerance:
+                        regressions.append(f"challenge {challenge} {name} {metric}")
+            if "events_per_second_before_drops" in result and "events_per_second_before_drops" in before:
+                print(f"challenge {challenge} {name} events/s: {before['events_per_second_before_drops']} -> {result['events_per_second_before_drops']}")
+                if result["events_per_second_before_drops"] < before["events_per_second_before_drops"]:
+                    regressions.append(f"challenge {challenge} {name} events_per_second_before_drops")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark edge-to-OSC latency and throughput of the puzzle handlers")
+    parser.add_argument("--challenges", nargs="+", default=sorted(WORKERS), choices=sorted(WORKERS))
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=200, help="resets sent per rate step in the reset storm")
+    parser.add_argument("--reset-rates", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="compare against a previous JSON result and exit non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown against the baseline")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        import challenge1, challenge4 # both configure logging on import, so set the level after
+        logging.getLogger().setLevel(args.log_level)
+        result = WORKERS[args.worker](args)
+        with open(args.worker_output, "w") as file:
+            json.dump(result, file)
+        return
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "iterations": args.iterations,
+        },
+        "challenges": {},
+    }
+
+    for challenge in args.challenges:
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            command = [sys.executable, os.path.abspath(__file__), "--worker", challenge, "--worker-output", output.name,
+                       "--iterations", str(args.iterations), "--burst", str(args.burst), "--log-level", args.log_level,
+                       "--reset-rates", *map(str, args.reset_rates)]
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            results["challenges"][challenge] = json.load(output)
+
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
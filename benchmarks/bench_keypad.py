@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# Keypad driver benchmark: key press to handler latency, and CPU time spent idle and while
+# typing, for the built-in matrix scanner (keypad.py) and pad4pi.
+#
+# On the simulated backend keys are pressed through the simulated switch matrix. The sim has
+# no pad4pi scanner (its keypad delivers presses straight to the handlers), so pad4pi latency
+# is only meaningful with --backend pi, where the idle CPU of both drivers is measured and no
+# keys are pressed.
+#
+#   python benchmarks/bench_keypad.py --output keypad.json
+import argparse, json, os, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "escape-room"))
+from bench_handlers import summarize
+
+ROW_PINS = [19, 26, 16, 20]
+COL_PINS = [6, 5, 13]
+
+
+def create(driver: str, args):
+    from hardware import KeypadFactory
+    from keypad import MatrixKeypad, KEYS
+
+    if driver == "matrix":
+        return MatrixKeypad(KEYS, ROW_PINS, COL_PINS, scan_interval=args.scan_interval, debounce=args.debounce)
+    return KeypadFactory().create_keypad(keypad=KEYS, row_pins=ROW_PINS, col_pins=COL_PINS)
+
+
+def idle_cpu(seconds: float) -> float:
+    started = time.process_time()
+    time.sleep(seconds)
+    return round((time.process_time() - started) / seconds * 100, 4)
+
+
+def bench_driver(driver: str, args, matrix=None) -> dict:
+    keypad = create(driver, args)
+    received:list[tuple[int, str]] = []
+    keypad.registerKeyPressHandler(lambda key: received.append((time.monotonic_ns(), key)))
+    time.sleep(0.1)
+
+    result = {"idle_cpu_percent": idle_cpu(args.idle)}
+
+    if matrix is not None:
+        keys = ("8140" * args.presses)[:args.presses]
+        matrix.press_log.clear()
+        started = time.process_time()
+        if driver == "matrix":
+            matrix.type(keys, hold=args.hold, gap=args.gap)
+        else:
+            for key in keys: # pad4pi stand-in: the press goes straight to the handlers
+                matrix.press_log.append((time.monotonic_ns(), key, True))
+                keypad.press(key)
+                time.sleep(args.hold + args.gap)
+        time.sleep(args.debounce * 2 + 0.1)
+        cpu = time.process_time() - started
+
+        pressed = [timestamp for timestamp, _, down in matrix.press_log if down]
+        result["typed"] = keys
+        result["received"] = "".join(key for _, key in received)
+        result["latency"] = summarize([got - sent for (got, _), sent in zip(received, pressed)], len(keys))
+        result["cpu_ms_per_press"] = round(cpu / len(keys) * 1000, 3)
+
+    if hasattr(keypad, "scans"):
+        result["scans"] = keypad.scans.value
+    keypad.cleanup()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the matrix keypad scanner against pad4pi")
+    parser.add_argument("--backend", choices=["sim", "pi"], default="sim")
+    parser.add_argument("--drivers", nargs="+", choices=["matrix", "pad4pi"], default=["matrix", "pad4pi"])
+    parser.add_argument("--presses", type=int, default=200)
+    parser.add_argument("--hold", type=float, default=0.04, help="seconds each simulated key is held")
+    parser.add_argument("--gap", type=float, default=0.03, help="seconds between simulated key presses")
+    parser.add_argument("--scan-interval", type=float, default=0.002)
+    parser.add_argument("--debounce", type=float, default=0.02)
+    parser.add_argument("--idle", type=float, default=2.0, help="seconds to measure idle CPU over")
+    parser.add_argument("--output", help="write the JSON results here as well as to stdout")
+    args = parser.parse_args()
+
+    os.environ["ESCAPEROOM_BACKEND"] = args.backend
+    from hardware import GPIO
+    from keypad import KEYS
+
+    GPIO.setmode(GPIO.BCM)
+    matrix = GPIO.attach_matrix(KEYS, ROW_PINS, COL_PINS) if args.backend == "sim" else None
+
+    results = {"backend": args.backend, "drivers": {}}
+    for driver in args.drivers:
+        results["drivers"][driver] = bench_driver(driver, args, matrix)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Acknowledged OSC delivery (osc.ReliableLink) across a lossy network. Two reliable
+# OSCControllers talk through a sim.LossyUDPRelay in each direction, which drops, duplicates
+# and delays datagrams. Every message must be applied exactly once and acked: the run exits
+# non-zero when one is lost, applied twice, or still waiting for its ack.
+#
+#   python benchmarks/bench_reliable.py --loss 0.3 --duplicate 0.1 --output reliable.json
+import argparse, json, logging, os, sys, threading, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "escape-room"))
+os.environ["ESCAPEROOM_BACKEND"] = "sim"
+from bench_handlers import free_port
+
+ADDRESS = "/escaperoom/bench/reliable"
+
+
+def run(args) -> dict:
+    from metrics import REGISTRY
+    from osc import OSCController
+    from sim import LossyUDPRelay
+
+    sender_port, receiver_port = free_port(), free_port()
+    relay = {"delay": (0, args.max_delay), "loss": args.loss, "duplicate": args.duplicate}
+    forward = LossyUDPRelay(("127.0.0.1", receiver_port), seed=args.seed, **relay)
+    back = LossyUDPRelay(("127.0.0.1", sender_port), seed=args.seed + 1, **relay) # carries the acks
+
+    sender = OSCController("127.0.0.1", sender_port, "127.0.0.1", forward.port, reliable=True)
+    receiver = OSCController("127.0.0.1", receiver_port, "127.0.0.1", back.port, reliable=True)
+
+    applied:list[int] = []
+    receiver.add_handler(ADDRESS, lambda address, value: applied.append(value))
+    for controller in (sender, receiver):
+        threading.Thread(target=controller.start_server, daemon=True).start()
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    for index in range(args.messages):
+        sender.send_message(ADDRESS, index, reliable=True)
+        time.sleep(args.gap)
+
+    deadline = time.monotonic() + args.timeout
+    while sender.link.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    took = time.monotonic() - started
+    time.sleep(args.max_delay * 2 + 0.05) # late duplicates still in flight
+
+    for controller in (sender, receiver):
+        controller.stop_server()
+    forward.close()
+    back.close()
+
+    counters = {name: REGISTRY.counter(name).value for name in ("osc_retransmits_total", "osc_duplicates_total", "osc_undelivered_total")}
+    return {
+        "messages": args.messages,
+        "applied": len(applied),
+        "applied_unique": len(set(applied)),
+        "missing": sorted(set(range(args.messages)) - set(applied)),
+        "unacked": sender.link.pending,
+        "seconds_to_all_acked": round(took, 3),
+        "retransmits": counters["osc_retransmits_total"],
+        "duplicates_ignored": counters["osc_duplicates_total"],
+        "undelivered": counters["osc_undelivered_total"],
+        "relay_forward": dict(forward.stats),
+        "relay_back": dict(back.stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time acknowledged OSC delivery through a lossy relay")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--gap", type=float, default=0.002, help="seconds between sends")
+    parser.add_argument("--loss", type=float, default=0.2, help="chance each relay drops a datagram")
+    parser.add_argument("--duplicate", type=float, default=0.1, help="chance each relay sends a datagram twice")
+    parser.add_argument("--max-delay", type=float, default=0.005, help="each datagram is delayed up to this many seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="write the JSON results here as well as to stdout")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+
+    failures = []
+    if results["missing"] or results["unacked"] or results["undelivered"]:
+        failures.append(f"{len(results['missing'])} not delivered, {results['unacked']} unacked, {results['undelivered']} given up on")
+    if results["applied"] != results["applied_unique"]:
+        failures.append(f"{results['applied'] - results['applied_unique']} applied more than once")
+    if args.duplicate and not results["duplicates_ignored"]:
+        failures.append("no duplicate reached the receiver, dedup was not exercised")
+    if failures:
+        print("Failed: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# OSC routing cost per packet: the stock python-osc Dispatcher against router.Router, with the
+# addresses the challenges really register and a mix of traffic for them and for other rooms.
+#
+#   python benchmarks/bench_router.py --output router.json
+import argparse, json, logging, os, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "escape-room"))
+os.environ["ESCAPEROOM_BACKEND"] = "sim"
+from bench_handlers import free_port
+
+
+def registered_addresses() -> list[str]:
+    import challenge1, challenge4
+    from hardware import GPIO
+
+    addresses = []
+    for module in (challenge1, challenge4):
+        module.CONFIG.update(
+            osc_rx_server_ip="127.0.0.1", osc_rx_server_port=free_port(),
+            osc_tx_client_ip="127.0.0.1", osc_tx_client_port=free_port(),
+            state_dir=tempfile.mkdtemp(prefix="escaperoom-bench-"), journal_path=None, heartbeat_interval=0,
+        )
+        addresses.extend(module.Handler().osc_controller.routes)
+        GPIO.cleanup() # the challenges share pins, and only their routes are wanted here
+    logging.disable(logging.CRITICAL) # their LED schedulers complain about the released pins
+    return addresses
+
+
+def traffic(addresses: list[str]) -> dict[str, list[bytes]]:
+    from osc import OSCSender
+    from pythonosc import osc_bundle_builder
+
+    def bundle(messages):
+        builder = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
+        for address, value in messages:
+            builder.add_content(OSCSender.build_message(address, value))
+        return builder.build().dgram
+
+    other = [f"/room{room}/{kind}/{index}" for room in range(2, 6) for kind in ("light", "sound", "prop") for index in range(8)]
+    return {
+        "routed": [OSCSender.build_message(address, 1).dgram for address in addresses],
+        "unrouted": [OSCSender.build_message(address, [0.5, index, "cue"]).dgram for index, address in enumerate(other)],
+        "unrouted_bundles": [bundle([(address, [0.25, 1.0]) for address in other[index:index + 4]]) for index in range(0, len(other), 4)],
+    }
+
+
+def time_dispatch(dispatcher, packets: list[bytes], rounds: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(rounds):
+        for packet in packets:
+            dispatcher.call_handlers_for_packet(packet, ("127.0.0.1", 9000))
+    return round((time.perf_counter_ns() - started) / (rounds * len(packets)) / 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OSC routing: python-osc Dispatcher against Router")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--output", help="write the JSON results here as well as to stdout")
+    args = parser.parse_args()
+
+    from pythonosc.dispatcher import Dispatcher
+    from router import Router
+
+    addresses = registered_addresses()
+    dispatchers = {"dispatcher": Dispatcher(), "router": Router()}
+    for dispatcher in dispatchers.values():
+        for address in addresses:
+            dispatcher.map(address, lambda *args: None)
+
+    results = {"addresses": len(addresses), "us_per_packet": {}}
+    for name, packets in traffic(addresses).items():
+        results["us_per_packet"][name] = {label: time_dispatch(dispatcher, packets, args.rounds) for label, dispatcher in dispatchers.items()}
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    os._exit(0) # the handlers' worker threads are not daemonic everywhere
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# Cold start benchmark: time from launching a challenge to its OSC server answering, and the
+# process's peak resident memory once it is up. Each run is a fresh interpreter, so imports,
+# GPIO setup and snapshot restore are all counted. Compare against a previous run to catch
+# regressions:
+#
+#   python benchmarks/bench_startup.py --output startup.json
+#   python benchmarks/bench_startup.py --baseline startup.json
+import argparse, json, os, platform, socket, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "escape-room"))
+from bench_handlers import free_port, summarize
+
+
+def peak_rss_kb(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def start_once(challenge: str, args, directory: str) -> tuple[int | None, int | None]:
+    from osc import OSCSender
+    from pythonosc.osc_packet import OscPacket
+
+    rx_port = free_port()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.settimeout(args.poll)
+
+    path = os.path.join(directory, f"challenge{challenge}.json")
+    with open(path, "w") as file:
+        json.dump({
+            "osc_rx_server_ip": "127.0.0.1", "osc_rx_server_port": rx_port,
+            "osc_tx_client_ip": "127.0.0.1", "osc_tx_client_port": listener.getsockname()[1],
+            "state_dir": directory, "heartbeat_interval": 0,
+        }, file)
+
+    query = OSCSender.build_message(f"/escaperoom/challenge/{challenge}/status", [1]).dgram
+    started = time.monotonic_ns()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "escape-room", f"challenge{challenge}.py"), path],
+        env={**os.environ, "ESCAPEROOM_BACKEND": args.backend}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    ready = None
+    deadline = time.monotonic() + args.timeout
+    try:
+        while ready is None and time.monotonic() < deadline and process.poll() is None:
+            listener.sendto(query, ("127.0.0.1", rx_port))
+            try:
+                data = listener.recv(65535)
+            except socket.timeout:
+                continue
+            if any(timed.message.address.endswith("/status/reply") for timed in OscPacket(data).messages):
+                ready = time.monotonic_ns() - started
+
+        time.sleep(args.settle)
+        rss = peak_rss_kb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+        listener.close()
+    return ready, rss
+
+
+def bench_challenge(challenge: str, args) -> dict:
+    ready, rss = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="escaperoom-startup-") as directory:
+            took, peak = start_once(challenge, args, directory)
+        if took is not None:
+            ready.append(took)
+        if peak is not None:
+            rss.append(peak)
+
+    rss.sort()
+    return {
+        "osc_ready": summarize(ready, args.runs),
+        "peak_rss_mb": {
+            "count": len(rss),
+            "p50": round(rss[len(rss) // 2] / 1024, 2) if rss else None,
+            "max": round(rss[-1] / 1024, 2) if rss else None,
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for challenge, result in results["challenges"].items():
+        before = baseline.get("challenges", {}).get(challenge, {})
+        for group, metric in (("osc_ready", "p50_ms"), ("osc_ready", "max_ms"), ("peak_rss_mb", "p50")):
+            now, then = result.get(group, {}).get(metric), before.get(group, {}).get(metric)
+            if now is not None and then:
+                ratio = now / then
+                print(f"challenge {challenge} {group} {metric}: {then} -> {now} ({ratio:.2f}x)")
+                if ratio > 1 + tolerance:
+                    regressions.append(f"challenge {challenge} {group} {metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark challenge cold start time and peak memory")
+    parser.add_argument("--challenges", nargs="+", default=["1", "4"], choices=["1", "4"])
+    parser.add_argument("--backend", choices=["sim", "pi"], default="sim")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--poll", type=float, default=0.002, help="seconds between readiness queries")
+    parser.add_argument("--settle", type=float, default=0.5, help="seconds to keep running after ready before reading peak RSS")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="compare against a previous JSON result and exit non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown or growth against the baseline")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "backend": args.backend,
+            "runs": args.runs,
+        },
+        "challenges": {challenge: bench_challenge(challenge, args) for challenge in args.challenges},
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
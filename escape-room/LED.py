@@ -1,72 +1,243 @@
-import RPi.GPIO as GPIO # type: ignore
 import logging, time, threading
 
+from metrics import REGISTRY
+from pinbank import BANK
+from realtime import REALTIME
+
+
+class FlashPattern():
+    # A pattern is a cycle of (level, duration) steps, e.g. ((True, 0.2), (False, 0.2))
+    def __init__(self, steps: list[tuple[bool, float]]):
+        if not steps or any(duration <= 0 for _, duration in steps):
+            raise ValueError(f"FlashPattern needs at least one step and positive durations: {steps}")
+        self.steps:tuple[tuple[bool, float], ...] = tuple((bool(level), float(duration)) for level, duration in steps)
+
+    @classmethod
+    def blink(cls, interval: float = 0.2) -> "FlashPattern":
+        return cls([(True, interval), (False, interval)])
+
+    @classmethod
+    def double_blink(cls, on: float = 0.1, gap: float = 0.1, off: float = 0.6) -> "FlashPattern":
+        return cls([(True, on), (False, gap), (True, on), (False, off)])
+
+    @property
+    def period(self) -> float:
+        return sum(duration for _, duration in self.steps)
+
+    def __repr__(self):
+        return f"FlashPattern(steps={list(self.steps)})"
+
+
+class _FlashEntry():
+    def __init__(self, led: "LEDIndicator", steps: tuple[tuple[bool, int], ...], epoch: int, offset: int):
+        self.led = led
+        self.steps = steps
+        self.period:int = sum(ticks for _, ticks in steps)
+        self.epoch:int = epoch
+        self.offset:int = offset
+        self.active:bool = True
+
+    def level_at(self, tick: int) -> tuple[bool, int]:
+        # Returns the level at `tick` and the tick of the next change, always derived from the
+        # group epoch so that LEDs sharing a group never drift relative to each other
+        start = self.epoch + self.offset
+        if tick < start:
+            return False, start
+
+        position = (tick - start) % self.period
+        elapsed = 0
+        for level, ticks in self.steps:
+            elapsed += ticks
+            if position < elapsed:
+                return level, tick + (elapsed - position)
+
+        return self.steps[-1][0], tick + 1
+
+
+class FlashScheduler():
+    # Hashed timing wheel driven by a single thread on the monotonic clock. Starting, stopping
+    # or changing a pattern is an O(1) insert or flag flip, so callers never wait on the thread.
+    __default = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, resolution: float = 0.005, slots: int = 512):
+        self.resolution:float = resolution
+        self.slots:int = slots
+
+        self.__wheel:list[list[tuple[int, _FlashEntry]]] = [[] for _ in range(slots)]
+        self.__groups:dict[str, int] = {}
+        self.__active:int = 0
+
+        self.__condition = threading.Condition()
+        self.__origin = time.monotonic()
+        self.__tick = 0
+        self.__thread = None
+
+    @classmethod
+    def default(cls) -> "FlashScheduler":
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+            return cls.__default
+
+    @property
+    def active_count(self) -> int:
+        return self.__active
+
+    @property
+    def thread_count(self) -> int:
+        return int(self.__thread is not None and self.__thread.is_alive())
+
+    def ticks(self, seconds: float) -> int:
+        return max(1, round(seconds / self.resolution))
+
+    def __now(self) -> int:
+        return int((time.monotonic() - self.__origin) / self.resolution)
+
+    def __insert(self, due: int, entry: _FlashEntry):
+        due = max(due, self.__tick + 1)
+        self.__wheel[due % self.slots].append((due, entry))
+
+    def __write(self, entry: _FlashEntry, level: bool):
+        BANK.output(entry.led.pin, level) # skipped when the level is unchanged
+
+    def start(self, led: "LEDIndicator", pattern: FlashPattern, offset: float = 0, group: str | None = None) -> _FlashEntry:
+        steps = tuple((level, self.ticks(duration)) for level, duration in pattern.steps)
+
+        with self.__condition:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name="FlashScheduler", daemon=True)
+                self.__thread.start()
+
+            if self.__active == 0:
+                # The thread stops advancing while idle, so catch the wheel up before scheduling
+                self.__tick = self.__now()
+
+            if group is None:
+                epoch = self.__tick + 1
+            else:
+                epoch = self.__groups.setdefault(group, self.__tick + 1)
+
+            entry = _FlashEntry(led, steps, epoch, self.ticks(offset) if offset else 0)
+            self.__active += 1
+            self.__insert(self.__tick + 1, entry)
+            self.__condition.notify()
+
+        return entry
+
+    def stop(self, entry: _FlashEntry, level: bool = False):
+        with self.__condition:
+            if entry.active:
+                entry.active = False
+                self.__active -= 1
+            self.__write(entry, level)
+
+    def __run(self):
+        REALTIME.release()
+        with self.__condition:
+            while True:
+                if self.__active == 0:
+                    self.__condition.wait()
+                    continue
+
+                now = self.__now()
+                while self.__tick < now:
+                    self.__tick += 1
+                    slot = self.__wheel[self.__tick % self.slots]
+                    if not slot:
+                        continue
+
+                    self.__wheel[self.__tick % self.slots] = pending = []
+                    for due, entry in slot:
+                        if not entry.active:
+                            continue
+                        if due > self.__tick:
+                            pending.append((due, entry))
+                            continue
+
+                        try:
+                            level, next_change = entry.level_at(self.__tick)
+                            self.__write(entry, level)
+                            self.__insert(next_change, entry)
+                        except Exception as e:
+                            logging.error("FlashScheduler failed to drive LEDIndicator(pin=%s): %s", entry.led.pin, e)
+                            entry.active = False
+                            self.__active -= 1
+
+                self.__condition.wait(self.__origin + (self.__tick + 1) * self.resolution - time.monotonic())
+
 
 class LEDIndicator():
-    def __init__(self, pin: int):
-        logging.debug(f"Initializing LEDIndicator: pin={pin}")
+    __slots__ = ("pin", "__scheduler", "__flash_entry")
+
+    def __init__(self, pin: int, scheduler: FlashScheduler | None = None, initial: bool = False, setup: bool = True):
+        # setup=False when the pin was already set up with the rest of a batch (BANK.setup_outputs)
+        logging.debug("Initializing LEDIndicator: pin=%s", pin)
         self.pin:int = pin
-        self.__stop_flashing = True
-        self.__flash_thread = None
-        
-        self.__stop_flashing_event = threading.Event()
-        self.__stop_flashing_event.clear()
-        self.__is_flashing = False
-        
-        GPIO.setup(self.pin, GPIO.OUT)
-        
+
+        self.__scheduler = scheduler
+        self.__flash_entry:_FlashEntry | None = None
+
+        if setup:
+            BANK.setup_output(self.pin, initial)
+
+    @property
+    def scheduler(self) -> FlashScheduler:
+        if self.__scheduler is None:
+            self.__scheduler = FlashScheduler.default()
+        return self.__scheduler
+
+    @property
+    def is_flashing(self) -> bool:
+        return self.__flash_entry is not None and self.__flash_entry.active
+
+    @property
+    def output_level(self) -> bool:
+        return BANK.output_level(self.pin)
+
     @property
     def state(self) -> bool:
-        state = GPIO.input(self.pin) == GPIO.HIGH
-        return state
+        return BANK.output_level(self.pin) # the shadow register, never a read of the pin
 
     @state.setter
     def state(self, value: bool):
-        if not self.__is_flashing:
-            logging.debug(f"Setting LEDIndicator(pin={self.pin}) state to: {value}")
-        GPIO.output(self.pin, GPIO.HIGH if value else GPIO.LOW)
-        
-    def flash(self, interval: float = 0.2, initial_delay: float = 0):
+        if not self.is_flashing:
+            logging.debug("Setting LEDIndicator(pin=%s) state to: %s", self.pin, value)
+        BANK.output(self.pin, bool(value))
+
+    def play(self, pattern: FlashPattern, offset: float = 0, group: str | None = None):
         try:
             self.stop_flashing()
-            self.state = False
 
-            logging.debug(f"LEDIndicator(pin={self.pin}) start flashing with interval: {interval}")
-            self.__stop_flashing_event.clear()
+            logging.debug("LEDIndicator(pin=%s) start flashing with pattern: %s, offset: %s, group: %s", self.pin, pattern, offset, group)
+            self.__flash_entry = self.scheduler.start(self, pattern, offset=offset, group=group)
+        except Exception as e:
+            logging.error("LEDIndicator(pin=%s) failed to start flashing: %s", self.pin, e)
 
-            def thread():
-                try:
-                    if initial_delay:
-                        time.sleep(initial_delay)
+    def flash(self, interval: float = 0.2, initial_delay: float = 0, group: str | None = None):
+        self.play(FlashPattern.blink(interval), offset=initial_delay, group=group)
 
-                    while not self.__stop_flashing_event.is_set():
-                        self.state = not self.state
-                        time.sleep(interval)
-                except Exception as e:
-                    logging.error(f"LEDIndicator(pin={self.pin}) encountered an error in flash thread: {e}")
+    def stop_flashing(self):
+        try:
+            if self.__flash_entry is not None:
+                if self.__flash_entry.active:
+                    logging.debug("LEDIndicator(pin=%s) stop flashing", self.pin)
+                self.scheduler.stop(self.__flash_entry)
+                self.__flash_entry = None
+        except Exception as e:
+            logging.error("LEDIndicator(pin=%s) failed to stop flashing: %s", self.pin, e)
 
-            self.__flash_thread = threading.Thread(target=thread, daemon=True)
-            self.__flash_thread.start()
+    def __repr__(self):
+        return f"LEDIndicator(pin={self.pin}, state={self.state}, flashing={self.is_flashing})"
 
-            self.__is_flashing = True
-        except Exception as e:
-            logging.error(f"LEDIndicator(pin={self.pin}) failed to start flashing: {e}")
 
-    def stop_flashing(self):
-        try:
-            if self.__is_flashing:
-                logging.debug(f"LEDIndicator(pin={self.pin}) stop flashing")
-                self.__stop_flashing_event.set()
+def flash_pair(first: LEDIndicator, second: LEDIndicator, interval: float, offset: float | None = None, group: str | None = None):
+    # Offset pair locked to a shared epoch, the second LED trailing the first by `offset`
+    # (by default a full interval, so the two alternate)
+    group = group or f"pair-{first.pin}-{second.pin}"
+    first.play(FlashPattern.blink(interval), group=group)
+    second.play(FlashPattern.blink(interval), offset=interval if offset is None else offset, group=group)
 
-                if self.__flash_thread:
-                    self.__flash_thread.join(timeout=1)  # Add a timeout to prevent indefinite blocking
-                    if self.__flash_thread.is_alive():
-                        logging.warning(f"LEDIndicator(pin={self.pin}) flashing thread did not terminate properly")
 
-                self.__is_flashing = False
-                self.state = False
-        except Exception as e:
-            logging.error(f"LEDIndicator(pin={self.pin}) failed to stop flashing: {e}")
-    
-    def __repr__(self):
-        return f"LEDIndicator(pin={self.pin}, state={self.state}, flashing={not self.__stop_flashing})"
+REGISTRY.gauge("led_flashing", lambda: FlashScheduler.default().active_count)
+REGISTRY.gauge("led_flash_threads", lambda: FlashScheduler.default().thread_count)
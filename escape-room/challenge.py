@@ -0,0 +1,54 @@
+from hardware import GPIO
+import signal, threading
+
+from osc import OSCController
+from runtime import create_runtime, post_on_signal
+from metrics import serve_metrics
+from logs import serve_logging
+from status import serve_status
+from profiler import serve_profiler
+from realtime import REALTIME
+import journal
+from config import config_path
+
+# The setup every challenge Handler shares, whether it runs standalone or under host.py
+
+
+def open_challenge(module: str, config: dict, load, validate, osc_controller: OSCController | None = None,
+                   config_file: str | None = None) -> tuple[OSCController, str | None, bool]:
+    # The start of every challenge Handler: its config file merged over CONFIG, the journal, the
+    # real-time mode and, unless a host passed its controller in, the GPIO session and OSC sockets.
+    # Returns the controller, the config file and whether the challenge runs standalone.
+    config_file = config_file or config_path(module)
+    if config_file:
+        config.update(load(config_file))
+    validate(config)
+
+    journal.open_journal(config["journal_path"], config["journal_records"])
+    if config["realtime"]:
+        REALTIME.enable(config["realtime_priority"], config["realtime_cpus"])
+
+    standalone = osc_controller is None
+    if standalone: # otherwise the host owns the GPIO session and OSC sockets
+        GPIO.setmode(GPIO.BCM)
+        osc_controller = OSCController(
+            config['osc_rx_server_ip'], config['osc_rx_server_port'],
+            config['osc_tx_client_ip'], config['osc_tx_client_port'],
+            runtime=create_runtime(config["runtime"]), reliable=config["osc_reliable"]
+        )
+    return osc_controller, config_file, standalone
+
+
+def serve_challenge(handler, challenge: str, config: dict, standalone: bool):
+    # The end of every challenge Handler, once its puzzle is armed: metrics, logging, status and
+    # the profiler over OSC, and config reloads over OSC and, standalone, on SIGHUP
+    osc_controller = handler.osc_controller
+    serve_metrics(osc_controller, challenge, prometheus_path=config["metrics_prometheus_path"])
+    serve_logging(osc_controller, challenge)
+    serve_status(osc_controller, challenge, handler.status, config["heartbeat_interval"])
+    serve_profiler(osc_controller, challenge, config)
+
+    osc_controller.add_handler(f"/escaperoom/{challenge}/config/reload", handler.reload_config)
+    if standalone and threading.current_thread() is threading.main_thread():
+        post_on_signal(osc_controller.runtime, signal.SIGHUP, handler.reload_config)
+    REALTIME.freeze()
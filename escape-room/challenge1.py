@@ -1,10 +1,20 @@
-import RPi.GPIO as GPIO # type: ignore
-from pythonosc import udp_client, dispatcher, osc_server
-import time, threading
-import logging
+from hardware import GPIO
+import copy, logging, sys
+
+from LED import LEDIndicator
+from osc import OSCController
+from debounce import Debouncer, DebouncePolicy
+from metrics import REGISTRY, timed
+from logs import configure_logging
+from snapshot import Snapshot
+from pinbank import BANK
+from challenge import open_challenge, serve_challenge
+from config import load_config, keep_restart_keys, check, check_common, check_pin, check_settle, check_unique_pins
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging(level=logging.DEBUG)
+
+CHALLENGE = "challenge/1"
 
 CONFIG = {
     "circuit_breakers": [
@@ -25,24 +35,42 @@ CONFIG = {
     "osc_rx_server_ip": "0.0.0.0",
     "osc_rx_server_port": 10001,
     "osc_tx_client_ip": "10.100.20.255",
-    "osc_tx_client_port": 10000
+    "osc_tx_client_port": 10000,
+    "osc_reliable": False, # tag success/failure with sequence numbers and resend them until /escaperoom/ack
+    "runtime": "threaded", # or "asyncio" to run all puzzle logic on one event loop thread
+    "debounce": {"circuit_breakers": 0.05}, # settle windows in seconds, per role
+    "metrics_prometheus_path": None, # e.g. "/var/lib/node_exporter/challenge1.prom"
+    "state_dir": None, # where the state snapshot lives, defaults to /dev/shm
+    "journal_path": None, # e.g. "/var/log/escaperoom/challenge1.journal" to record edges, keys and OSC for replay.py
+    "journal_records": 65536, # ring size, 12 bytes per record
+    "heartbeat_interval": 2.0, # seconds between /escaperoom/heartbeat broadcasts for monitor.py, 0 to disable
+    "profile_dir": None, # where /profile/start writes collapsed stacks, defaults to the temp directory
+    "profile_interval": 0.005, # seconds between profiler samples
+    "realtime": False, # SCHED_FIFO, CPU pinning and locked memory for the edge, timer and OSC threads, see realtime.py
+    "realtime_priority": 50, # SCHED_FIFO priority, 1-99
+    "realtime_cpus": None, # cores for those threads, defaults to the highest core
 }
 
+DEFAULTS = copy.deepcopy(CONFIG)
+
 
 class CircuitBreaker():
-    def __init__(self, pin: int, valid_state: bool, handler: "Handler"):
-        logging.debug(f"Initializing CircuitBreaker: pin={pin}, valid_state={valid_state}")
+    __slots__ = ("handler", "pin", "valid_state", "debounce")
+
+    def __init__(self, pin: int, valid_state: bool, handler: "Handler", debounce: DebouncePolicy | None = None, setup: bool = True):
+        logging.debug("Initializing CircuitBreaker: pin=%s, valid_state=%s", pin, valid_state)
         self.handler:"Handler" = handler
         self.pin:int = pin
         self.valid_state:bool = valid_state
+        self.debounce:DebouncePolicy = debounce or DebouncePolicy()
         
-        GPIO.setup(self.pin, GPIO.IN)
-        GPIO.add_event_detect(self.pin, GPIO.BOTH, callback=self.handler.on_breaker_change, bouncetime=200)
+        if setup:
+            GPIO.setup(self.pin, GPIO.IN)
+        self.handler.debouncer.watch(self.pin, self.handler.on_breaker_change, self.debounce)
 
     @property
     def state(self) -> bool:
-        state = GPIO.input(self.pin) == GPIO.HIGH
-        return state
+        return BANK.level(self.pin)
     
     @property
     def valid(self) -> bool:
@@ -53,129 +81,218 @@ class CircuitBreaker():
         return f"CircuitBreaker(pin={self.pin}, valid_state={self.valid_state}, state={self.state}, valid={self.valid})"
 
 
-class LEDIndicator():
-    def __init__(self, pin: int):
-        logging.debug(f"Initializing LEDIndicator: pin={pin}")
-        self.pin:int = pin
-        self.__stop_flashing = True
-        self.__flash_thread = None
-        
-        self.__stop_flashing_event = threading.Event()
-        self.__stop_flashing_event.clear()
-        self.__is_flashing = False
-        
-        GPIO.setup(self.pin, GPIO.OUT)
-        
-    @property
-    def state(self) -> bool:
-        state = GPIO.input(self.pin) == GPIO.HIGH
-        return state
-
-    @state.setter
-    def state(self, value: bool):
-        if not self.__is_flashing:
-            logging.debug(f"Setting LEDIndicator(pin={self.pin}) state to: {value}")
-        GPIO.output(self.pin, GPIO.HIGH if value else GPIO.LOW)
-        
-    def flash(self, interval: float = 0.2):
-        logging.debug(f"LEDIndicator(pin={self.pin}) start flashing with interval: {interval}")
-        self.__stop_flashing_event.clear()
-        
-        def thread():
-            while not self.__stop_flashing_event.is_set():
-                self.state = not self.state
-                time.sleep(interval)
-                
-        self.__flash_thread = threading.Thread(target=thread)
-        self.__flash_thread.start()
-        
-        self.__is_flashing = True
-        
-    def stop_flashing(self):
-        if self.__is_flashing:
-            logging.debug(f"LEDIndicator(pin={self.pin}) stop flashing")
-            self.__stop_flashing_event.set()
-            self.__flash_thread.join()
-            
-            self.__is_flashing = False
-            self.state = False
-    
-    def __repr__(self):
-        return f"LEDIndicator(pin={self.pin}, state={self.state}, flashing={not self.__stop_flashing})"
+def claimed_pins() -> set[int]:
+    return {breaker["pin"] for breaker in CONFIG["circuit_breakers"]} | set(CONFIG["leds"])
+
+
+def validate_config(config: dict):
+    check_common(config)
+    check(isinstance(config["circuit_breakers"], list) and config["circuit_breakers"], "circuit_breakers must be a non-empty list")
+    for breaker in config["circuit_breakers"]:
+        check(isinstance(breaker, dict) and {"pin", "valid_state"} <= set(breaker), f"each circuit breaker needs a pin and valid_state: {breaker!r}")
+        check_pin(breaker["pin"], "circuit_breakers.pin")
+        check(isinstance(breaker["valid_state"], bool), f"circuit_breakers.valid_state must be true or false: {breaker!r}")
+        if "settle" in breaker:
+            check_settle(breaker["settle"], "circuit_breakers.settle")
+    check(isinstance(config["leds"], list) and config["leds"], "leds must be a non-empty list of pins")
+    for pin in config["leds"]:
+        check_pin(pin, "leds")
+    check_settle(config["debounce"].get("circuit_breakers"), "debounce.circuit_breakers")
+    check_unique_pins([breaker["pin"] for breaker in config["circuit_breakers"]] + config["leds"], "the challenge 1 config")
+
+
+def load(path: str | None) -> dict:
+    return load_config(path, DEFAULTS, validate_config)
 
 
 class Handler():
-    def __init__(self):
+    def __init__(self, osc_controller: OSCController | None = None, config_file: str | None = None):
         logging.debug("Initializing Handler...")
-        GPIO.setmode(GPIO.BCM)
-
-        self.breakers:list[CircuitBreaker] = [
-            CircuitBreaker(breaker["pin"], breaker["valid_state"], self)
-            for breaker in CONFIG["circuit_breakers"]
-        ]
         
-        self.leds:list[LEDIndicator] = [LEDIndicator(pin) for pin in CONFIG["leds"]]
+        osc_controller, self.config_file, standalone = open_challenge("challenge1", CONFIG, load, validate_config, osc_controller, config_file)
         
-        for led in self.leds:
-            led.state = False
+        self.osc_controller = osc_controller
+        self.runtime = osc_controller.runtime
+        self.debouncer = Debouncer(self.runtime)
         
-        self.__unlocked = False
+        # restore before the LEDs are driven; a restored success is shown but not re-sent
+        self.snapshot = Snapshot("challenge1", CONFIG["state_dir"])
+        self.__unlocked = (self.snapshot.load() or {}).get("unlocked", False)
+        
+        # every output driven in one batch before any input is armed, then every input in one call
+        BANK.setup_outputs({pin: self.__unlocked for pin in CONFIG["leds"]})
+        BANK.setup_inputs([breaker["pin"] for breaker in CONFIG["circuit_breakers"]])
+        
+        self.leds:list[LEDIndicator] = [LEDIndicator(pin, setup=False) for pin in CONFIG["leds"]]
+        self.led_targets:list[str | None] = [None] * len(self.leds)
+        
+        self.breaker_states:int = 0
+        self.build_masks()
         
         self.counter:int = 0
+        
+        with BANK.snapshot(): # the starting level of every breaker from one read
+            self.breakers:list[CircuitBreaker] = [
+                CircuitBreaker(breaker["pin"], breaker["valid_state"], self, DebouncePolicy(settle=breaker.get("settle", CONFIG["debounce"]["circuit_breakers"])), setup=False)
+                for breaker in CONFIG["circuit_breakers"]
+            ]
+        
         self.on_breaker_change()
         
-        osc_rx_dispatcher = dispatcher.Dispatcher()
-        osc_rx_dispatcher.map("/escaperoom/challenge/1/reset", self.reset)
+        self.osc_controller.add_handler("/escaperoom/challenge/1/reset", self.reset)
         
-        osc_rx_server = osc_server.BlockingOSCUDPServer((CONFIG['osc_rx_server_ip'], CONFIG['osc_rx_server_port']), osc_rx_dispatcher)
-        logging.debug(f"Starting OSC server listening on {CONFIG['osc_rx_server_ip']}:{CONFIG['osc_rx_server_port']}")
-        osc_rx_server.serve_forever()
+        self.resets = REGISTRY.counter("resets_total", challenge=1)
+        serve_challenge(self, CHALLENGE, CONFIG, standalone)
+    
+    def run(self):
+        self.osc_controller.start_server()
+    
+    def status(self) -> dict:
+        return {"unlocked": self.__unlocked, "counter": self.counter}
     
-    def on_breaker_change(self, *a):
-        logging.debug("Breaker state changed")
+    def build_masks(self):
+        # Breaker states are packed into a bitmask (bit i = breaker i is on), so an edge only
+        # has to read and flip the bit of the pin that changed
+        self.breaker_bits:dict[int, int] = {breaker["pin"]: 1 << index for index, breaker in enumerate(CONFIG["circuit_breakers"])}
+        self.valid_mask:int = sum(1 << index for index, breaker in enumerate(CONFIG["circuit_breakers"]) if breaker["valid_state"])
+        self.invalid_mask:int = ((1 << len(CONFIG["circuit_breakers"])) - 1) & ~self.valid_mask
+    
+    def read_breakers(self):
+        self.breaker_states = 0
+        with BANK.snapshot():
+            for breaker in self.breakers:
+                if breaker.state:
+                    self.breaker_states |= self.breaker_bits[breaker.pin]
+    
+    @timed("handler_seconds", handler="on_breaker_change")
+    def on_breaker_change(self, pin: int | None = None, level: bool | None = None):
+        logging.debug("Breaker state changed: pin=%s", pin)
         
         if self.__unlocked:
             logging.debug("Already unlocked, ignoring breaker change")
             return
         
-        self.counter = 0
+        if pin in self.breaker_bits and level is not None:
+            if level:
+                self.breaker_states |= self.breaker_bits[pin]
+            else:
+                self.breaker_states &= ~self.breaker_bits[pin]
+        else:
+            self.read_breakers()
         
-        for breaker in self.breakers:
-            if breaker.state: # if the breaker is on
-                self.counter += 1 if breaker.valid else -1 # increment or decrement based on whether breaker should be on or off
+        # every breaker that is on counts +1 if it should be on and -1 if it should be off
+        self.counter = (self.breaker_states & self.valid_mask).bit_count() - (self.breaker_states & self.invalid_mask).bit_count()
         
-        logging.debug(f"Counter: {self.counter}")
+        logging.debug("Counter: %s", self.counter)
         
         for index, led in enumerate(self.leds):
             if (index + 0.5) * 2 < self.counter:
+                target = "on"
+            elif (index + 0.5) * 2 == self.counter:
+                target = "flash"
+            else:
+                target = "off"
+            
+            if target == self.led_targets[index]:
+                continue
+            self.led_targets[index] = target
+            
+            if target == "on":
                 led.stop_flashing()
                 led.state = True
-                
-            elif (index + 0.5) * 2 == self.counter:
+            elif target == "flash":
                 led.flash()
-                
             else:
                 led.stop_flashing()
+                led.state = False
         
         if self.counter == 6:
-            logging.debug(f"Sending success osc command to {CONFIG['osc_tx_client_ip']}:{CONFIG['osc_tx_client_port']}")
+            logging.debug("Sending success osc command to %s:%s", CONFIG['osc_tx_client_ip'], CONFIG['osc_tx_client_port'])
             
             self.__unlocked = True
+            self.snapshot.save({"unlocked": True})
             
-            osc_tx_client = udp_client.SimpleUDPClient(CONFIG["osc_tx_client_ip"], CONFIG["osc_tx_client_port"], allow_broadcast=True)
-            osc_tx_client.send_message("/escaperoom/challenge/1/success", 1)
+            self.osc_controller.send_message("/escaperoom/challenge/1/success", 1, reliable=True)
 
     def reset(self, *a):
         logging.debug("Resetting Handler...")
+        self.resets.inc()
         self.__unlocked = False
+        self.snapshot.save({"unlocked": False})
         
         for led in self.leds:
             led.stop_flashing()
             led.state = False
+        self.led_targets = [None] * len(self.leds)
             
         self.counter = 0
         self.on_breaker_change()
+    
+    def reload_config(self, *args):
+        if not self.config_file:
+            logging.warning("CONFIG - No config file to reload, set ESCAPEROOM_CONFIG_CHALLENGE1 or pass one on the command line")
+            return
+        
+        try:
+            config = load(self.config_file)
+        except (OSError, ValueError) as e:
+            logging.error("CONFIG - Keeping the current config, failed to load %s: %s", self.config_file, e)
+            return
+        
+        keep_restart_keys(CONFIG, config)
+        self.apply_config(config)
+    
+    def apply_config(self, config: dict):
+        # Breakers that kept their pin stay armed; only added, removed or re-timed pins are
+        # touched. The bitmask is rebuilt from the new order and re-read in one pass.
+        CONFIG.clear()
+        CONFIG.update(config)
+        
+        breakers = {breaker.pin: breaker for breaker in self.breakers}
+        new_pins = {breaker["pin"] for breaker in config["circuit_breakers"]}
+        for pin in breakers.keys() - new_pins:
+            self.debouncer.unwatch(pin)
+        
+        led_pins = [led.pin for led in self.leds]
+        for index, led in enumerate(self.leds):
+            if index >= len(config["leds"]) or config["leds"][index] != led.pin:
+                led.stop_flashing()
+                led.state = False
+        
+        rearmed = sorted((breakers.keys() ^ new_pins) | (set(led_pins) ^ set(config["leds"])))
+        
+        self.breakers = []
+        for entry in config["circuit_breakers"]:
+            debounce = DebouncePolicy(settle=entry.get("settle", config["debounce"]["circuit_breakers"]))
+            breaker = breakers.get(entry["pin"])
+            if breaker is None:
+                breaker = CircuitBreaker(entry["pin"], entry["valid_state"], self, debounce)
+            else:
+                breaker.valid_state = entry["valid_state"]
+                if breaker.debounce.settle != debounce.settle:
+                    breaker.debounce = debounce
+                    self.debouncer.unwatch(breaker.pin)
+                    self.debouncer.watch(breaker.pin, self.on_breaker_change, debounce)
+            self.breakers.append(breaker)
+        
+        self.leds = [
+            self.leds[index] if index < len(led_pins) and led_pins[index] == pin else LEDIndicator(pin)
+            for index, pin in enumerate(config["leds"])
+        ]
+        self.led_targets = [
+            self.led_targets[index] if index < len(led_pins) and led_pins[index] == pin else None
+            for index, pin in enumerate(config["leds"])
+        ]
+        
+        logging.info("CONFIG - Reloaded %s, re-armed GPIOs %s", self.config_file, rearmed or "none")
+        
+        self.build_masks()
+        if self.__unlocked:
+            for led in self.leds:
+                led.state = True
+        else:
+            self.on_breaker_change()
 
 
 if __name__ == "__main__":
-    handler = Handler()
\ No newline at end of file
+    Handler(config_file=sys.argv[1] if len(sys.argv) > 1 else None).run()
\ No newline at end of file
@@ -1,17 +1,29 @@
-import RPi.GPIO as GPIO # type: ignore
-from pythonosc import udp_client, dispatcher, osc_server
-from pad4pi import rpi_gpio # type: ignore
-import logging, time
+from hardware import GPIO
+import copy, logging, sys
 
-from LED import LEDIndicator
+from LED import LEDIndicator, flash_pair
+from keypad import MatrixKeypad
+from osc import OSCController
+from debounce import Debouncer, DebouncePolicy
+from metrics import REGISTRY, timed
+from logs import configure_logging
+from snapshot import Snapshot
+from pinbank import BANK
+from challenge import open_challenge, serve_challenge
+import journal
+from config import load_config, keep_restart_keys, check, check_common, check_pin, check_settle, check_unique_pins
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging(level=logging.DEBUG)
         
 # from right to left looking at the keypad, the GPIOs wired in to the pins are:
 # 21, 20, 16, 26, 19, 13, 6, 5
 
-CONFIG:dict[str, str | int | list[dict] | dict[str, int]] = {
+CHALLENGE = "challenge/4"
+
+# Defaults. A TOML/JSON config file (see config.py) is merged over them at start, and a reload
+# replaces the whole dict with the file merged over DEFAULTS again
+CONFIG:dict[str, str | int | float | bool | list | dict | None] = {
     "defuse_wires": [
         {"pin": 18, "needs_cutting": False},  # GPIO 18,  pin 12
         {"pin": 27, "needs_cutting": False},  # GPIO 27,  pin 13
@@ -29,58 +41,52 @@ CONFIG:dict[str, str | int | list[dict] | dict[str, int]] = {
     "osc_rx_server_port": 10001,
     "osc_tx_client_ip": "10.100.20.255",
     "osc_tx_client_port": 10000,
+    "osc_reliable": False, # tag success/failure with sequence numbers and resend them until /escaperoom/ack
+    "runtime": "threaded", # or "asyncio" to run all puzzle logic on one event loop thread
+    "debounce": {"defuse_wires": 0.1, "button": 0.05, "keypad": 0.02}, # settle windows in seconds, per role
+    "metrics_prometheus_path": None, # e.g. "/var/lib/node_exporter/challenge4.prom"
+    "state_dir": None, # where the state snapshot lives, defaults to /dev/shm
+    "journal_path": None, # e.g. "/var/log/escaperoom/challenge4.journal" to record edges, keys and OSC for replay.py
+    "journal_records": 65536, # ring size, 12 bytes per record
+    "heartbeat_interval": 2.0, # seconds between /escaperoom/heartbeat broadcasts for monitor.py, 0 to disable
+    "profile_dir": None, # where /profile/start writes collapsed stacks, defaults to the temp directory
+    "profile_interval": 0.005, # seconds between profiler samples
+    "realtime": False, # SCHED_FIFO, CPU pinning and locked memory for the edge, timer and OSC threads, see realtime.py
+    "realtime_priority": 50, # SCHED_FIFO priority, 1-99
+    "realtime_cpus": None, # cores for those threads, defaults to the highest core
     
     "keypad_row_pins": [19, 26, 16, 20],
     "keypad_col_pins": [6, 5, 13],
     "keypad_correct_code": 8140,
     "keypad_attempts": 5,
+    "keypad_driver": "pad4pi", # or "matrix" for the built-in interrupt-driven scanner in keypad.py
+    "keypad_scan_interval": 0.002, # matrix driver only, seconds between row scans while a key is down
+    "keypad_rollover": 2, # matrix driver only, most keys reported down at once
+    
+    "vault_relay_pin": 4,
+    "button_pin": 3,
 }
 
+DEFAULTS = copy.deepcopy(CONFIG)
 
-class OSCController():
-    def __init__(self, rx_ip: str, rx_port: int, tx_ip: str, tx_port: int):
-        logging.debug("OSC - Initializing OSC Controller...")
-        self.rx_ip = rx_ip
-        self.rx_port = rx_port
-        self.tx_ip = tx_ip
-        self.tx_port = tx_port
-
-        self.dispatcher = dispatcher.Dispatcher()
-        self.server = osc_server.BlockingOSCUDPServer((self.rx_ip, self.rx_port), self.dispatcher)
-        self.server_active = False
-
-    def add_handler(self, address: str, handler):
-        self.dispatcher.map(address, handler)
-
-    def start_server(self):
-        logging.debug(f"OSC - Starting OSC server listening on {self.rx_ip}:{self.rx_port}")
-        
-        if self.server_active:
-            logging.debug("OSC - Server is already running, stopping it...")
-            self.server.shutdown()
-        
-        self.server.serve_forever()
-
-    def send_message(self, address: str, value):
-        logging.debug(f"OSC - Sending OSC message to {self.tx_ip}:{self.tx_port} - {address}: {value}")
-        client = udp_client.SimpleUDPClient(self.tx_ip, self.tx_port, allow_broadcast=True)
-        client.send_message(address, value)
-        
 
 class DiffusalWire():
-    def __init__(self, pin: int, needs_cutting: bool, handler: "Handler"):
-        logging.debug(f"WIRECUT - Initializing DiffusalWire: pin={pin}, needs_cutting={needs_cutting}")
+    __slots__ = ("handler", "pin", "needs_cutting", "debounce")
+
+    def __init__(self, pin: int, needs_cutting: bool, handler: "Handler", debounce: DebouncePolicy | None = None, setup: bool = True):
+        logging.debug("WIRECUT - Initializing DiffusalWire: pin=%s, needs_cutting=%s", pin, needs_cutting)
         self.handler:"Handler" = handler
         self.pin:int = pin
         self.needs_cutting:bool = needs_cutting
+        self.debounce:DebouncePolicy = debounce or DebouncePolicy()
         
-        GPIO.setup(self.pin, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-        GPIO.add_event_detect(self.pin, GPIO.BOTH, callback=self.handler.wirecut_on_state_change, bouncetime=200)
+        if setup:
+            GPIO.setup(self.pin, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        self.handler.debouncer.watch(self.pin, self.handler.wirecut_on_state_change, self.debounce)
 
     @property
     def state(self) -> bool:
-        state = GPIO.input(self.pin) == GPIO.HIGH
-        return state
+        return BANK.level(self.pin)
     
     @property
     def valid(self) -> bool:
@@ -91,67 +97,169 @@ class DiffusalWire():
         return f"DiffusalWire(pin={self.pin}, needs_cutting={self.needs_cutting}, state={self.state})"
 
 
+def pin_roles(config: dict) -> dict[int, str]:
+    roles = {wire["pin"]: "wire" for wire in config["defuse_wires"]}
+    roles.update({pin: f"led:{name}" for name, pin in config["leds"].items()})
+    roles.update({pin: "keypad" for pin in config["keypad_row_pins"] + config["keypad_col_pins"]})
+    roles[config["vault_relay_pin"]] = "relay"
+    roles[config["button_pin"]] = "button"
+    return roles
+
+
+def claimed_pins() -> set[int]:
+    return set(pin_roles(CONFIG))
+
+
+def validate_config(config: dict):
+    check_common(config)
+    check(isinstance(config["defuse_wires"], list) and config["defuse_wires"], "defuse_wires must be a non-empty list")
+    for wire in config["defuse_wires"]:
+        check(isinstance(wire, dict) and {"pin", "needs_cutting"} <= set(wire), f"each defuse wire needs a pin and needs_cutting: {wire!r}")
+        check_pin(wire["pin"], "defuse_wires.pin")
+        check(isinstance(wire["needs_cutting"], bool), f"defuse_wires.needs_cutting must be true or false: {wire!r}")
+        if "settle" in wire:
+            check_settle(wire["settle"], "defuse_wires.settle")
+    check(isinstance(config["leds"], dict) and set(config["leds"]) == {"red1", "red2", "green"}, "leds must map exactly red1, red2 and green to pins")
+    for key, count in (("keypad_row_pins", 4), ("keypad_col_pins", 3)):
+        check(isinstance(config[key], list) and len(config[key]) == count, f"{key} must be a list of {count} pins")
+    for role in ("defuse_wires", "button", "keypad"):
+        check_settle(config["debounce"].get(role), f"debounce.{role}")
+    for pin in [*config["leds"].values(), *config["keypad_row_pins"], *config["keypad_col_pins"], config["vault_relay_pin"], config["button_pin"]]:
+        check_pin(pin, "pin")
+    check(isinstance(config["keypad_correct_code"], int) and 0 <= config["keypad_correct_code"] <= 9999, "keypad_correct_code must be a 4 digit number")
+    check(isinstance(config["keypad_attempts"], int) and config["keypad_attempts"] >= 1, "keypad_attempts must be at least 1")
+    check(config["keypad_driver"] in ("pad4pi", "matrix"), f"keypad_driver must be 'pad4pi' or 'matrix', got {config['keypad_driver']!r}")
+    check(isinstance(config["keypad_scan_interval"], (int, float)) and config["keypad_scan_interval"] > 0, "keypad_scan_interval must be a positive number of seconds")
+    check(config["keypad_rollover"] is None or isinstance(config["keypad_rollover"], int) and config["keypad_rollover"] >= 1, "keypad_rollover must be at least 1")
+    check_unique_pins([
+        *(wire["pin"] for wire in config["defuse_wires"]), *config["leds"].values(),
+        *config["keypad_row_pins"], *config["keypad_col_pins"], config["vault_relay_pin"], config["button_pin"],
+    ], "the challenge 4 config")
+
+
+def load(path: str | None) -> dict:
+    return load_config(path, DEFAULTS, validate_config)
+
+
 class Handler():
-    def __init__(self):
-        GPIO.setmode(GPIO.BCM)
+    def __init__(self, osc_controller: OSCController | None = None, config_file: str | None = None):
+        osc_controller, self.config_file, standalone = open_challenge("challenge4", CONFIG, load, validate_config, osc_controller, config_file)
         
-        self.osc_controller = OSCController(
-            CONFIG['osc_rx_server_ip'], CONFIG['osc_rx_server_port'],
-            CONFIG['osc_tx_client_ip'], CONFIG['osc_tx_client_port']
-        )
+        self.osc_controller = osc_controller
+        self.runtime = osc_controller.runtime
+        self.debouncer = Debouncer(self.runtime)
         
-        self.keypad_started = False
-        self.keypad_finished = False
+        # restore before any output is driven, so a restart carries on where it left off
+        self.snapshot = Snapshot("challenge4", CONFIG["state_dir"])
+        self.restored:dict = self.snapshot.load() or {}
         
+        self.keypad_started = self.restored.get("keypad_started", False)
+        self.keypad_finished = self.restored.get("keypad_finished", False)
+        self.keypad_input = self.restored.get("keypad_input", "")
+        self.keypad_strikes = self.restored.get("keypad_strikes", 0)
+        
+        self.arm_gpio()
+        self.init_vault_door()
         self.init_wire_cutting()
         self.init_keypad()
-        self.init_vault_door()
         self.init_button()
+        self.save_state()
+        
+        serve_challenge(self, CHALLENGE, CONFIG, standalone)
         
+    def run(self):
         self.osc_controller.start_server()
         
+    def state(self) -> dict:
+        return {
+            "wirecut_unlocked": self.wirecut__unlocked,
+            "wirecut_exploded": self.wirecut__exploded,
+            "keypad_started": self.keypad_started,
+            "keypad_finished": self.keypad_finished,
+            "keypad_strikes": self.keypad_strikes,
+            "keypad_input": self.keypad_input,
+            "vault_locked": self.vault_locked,
+        }
+        
+    def save_state(self):
+        self.snapshot.save(self.state())
+        
+    def status(self) -> dict:
+        status = self.state()
+        status["keypad_input"] = len(self.keypad_input) # how many digits, not the digits
+        return status
+        
+    
+    def arm_gpio(self):
+        # Every output, the vault relay included, is driven to its safe or restored level in one
+        # batch before anything else starts, then every wire and the button are set up in one call
+        unlocked = self.restored.get("wirecut_unlocked", False) and not self.restored.get("wirecut_exploded", False)
+        BANK.setup_outputs({
+            CONFIG["vault_relay_pin"]: self.restored.get("vault_locked", False),
+            **{pin: name == "green" and unlocked for name, pin in CONFIG["leds"].items()},
+        })
+        BANK.setup_inputs([wire["pin"] for wire in CONFIG["defuse_wires"]] + [CONFIG["button_pin"]], GPIO.PUD_DOWN)
+    
     
     def init_wire_cutting(self):
         logging.debug("WIRECUT - Initializing Wire Cut Handler...")
 
-        self.wirecut_wires:list[DiffusalWire] = [
-            DiffusalWire(wire["pin"], wire["needs_cutting"], self)
-            for wire in CONFIG["defuse_wires"]
-        ]
-        
-        self.wirecut_leds:dict[str, LEDIndicator] = {
-            f"{name}": LEDIndicator(pin) 
-            for name, pin in CONFIG["leds"].items()
-        }
-        
-        self.wirecut_leds["red1"].flash(interval = 0.15)
-        self.wirecut_leds["red2"].flash(interval = 0.15, initial_delay = 0.08)
-        self.wirecut_leds["green"].state = False
-        
-        self.wirecut__unlocked = False
-        self.wirecut__exploded = False
+        with BANK.snapshot(): # the starting level of every wire from one read
+            self.wirecut_wires:list[DiffusalWire] = [
+                DiffusalWire(wire["pin"], wire["needs_cutting"], self, DebouncePolicy(settle=wire.get("settle", CONFIG["debounce"]["defuse_wires"])), setup=False)
+                for wire in CONFIG["defuse_wires"]
+            ]
+        
+        # a restored success or failure is shown again but not re-sent
+        self.wirecut__unlocked = self.restored.get("wirecut_unlocked", False)
+        self.wirecut__exploded = self.restored.get("wirecut_exploded", False)
+        
+        self.wirecut_leds:dict[str, LEDIndicator] = {f"{name}": LEDIndicator(pin, setup=False) for name, pin in CONFIG["leds"].items()}
+        self.wirecut_show_state()
 
+        resets = REGISTRY.counter("resets_total", challenge=4)
+        
         def reset( *a):
             logging.debug("WIRECUT - Resetting Handler...")
+            resets.inc()
             
             self.wirecut__unlocked = False
             self.wirecut__exploded = False
+            self.wirecut_show_state()
             
-            for _, led in self.wirecut_leds.items():
-                led.stop_flashing()
-            
-            self.wirecut_leds["red1"].flash(interval = 0.15)
-            self.wirecut_leds["red2"].flash(interval = 0.15, initial_delay = 0.08)
-            self.wirecut_leds["green"].state = False
+            # restarting no longer clears the keypad, so a reset does
+            self.keypad_started = False
+            self.keypad_finished = False
+            self.keypad_input = ""
+            self.keypad_strikes = 0
             
             self.wirecut_on_state_change()
+            self.save_state()
     
         self.wirecut_on_state_change()
         
         self.osc_controller.add_handler("/escaperoom/challenge/4/reset", reset)
     
     
-    def wirecut_on_state_change(self, *a):
+    def wirecut_show_state(self):
+        for _, led in self.wirecut_leds.items():
+            led.stop_flashing()
+        
+        if self.wirecut__exploded:
+            self.wirecut_leds["red1"].flash(interval = 0.05, group = "wirecut")
+            self.wirecut_leds["red2"].flash(interval = 0.06, group = "wirecut")
+            self.wirecut_leds["green"].state = False
+        elif self.wirecut__unlocked:
+            self.wirecut_leds["red1"].state = False
+            self.wirecut_leds["red2"].state = False
+            self.wirecut_leds["green"].state = True
+        else:
+            flash_pair(self.wirecut_leds["red1"], self.wirecut_leds["red2"], interval = 0.15, offset = 0.08, group = "wirecut")
+            self.wirecut_leds["green"].state = False
+    
+    
+    @timed("handler_seconds", handler="wirecut_on_state_change")
+    def wirecut_on_state_change(self, pin: int | None = None, level: bool | None = None):
         logging.debug("WIRECUT - Wire cut state changed")
         
         if self.wirecut__unlocked or self.wirecut__exploded:
@@ -163,43 +271,31 @@ class Handler():
         
         cut_state = ""
         
-        time.sleep(0.1)
-        
-        for wire in self.wirecut_wires:
-            cut_state += str(int(wire.state))
-            
-            if not wire.state and wire.needs_cutting:
-                self.wirecut__unlocked = True
-            elif not wire.state and not wire.needs_cutting:
-                self.wirecut__exploded = True
+        with BANK.snapshot(): # one read of the bank for every wire
+            for wire in self.wirecut_wires:
+                cut_state += str(int(wire.state))
+                
+                if not wire.state and wire.needs_cutting:
+                    self.wirecut__unlocked = True
+                elif not wire.state and not wire.needs_cutting:
+                    self.wirecut__exploded = True
                 
-        logging.debug(f"WIRECUT - Current Wire Connections: {cut_state}")
+        logging.debug("WIRECUT - Current Wire Connections: %s", cut_state)
         
         if self.wirecut__exploded:
-            logging.debug(f"WIRECUT - Incorrect wire cut")
-            
-            self.wirecut_leds["red1"].flash(interval = 0.05)
-            self.wirecut_leds["red2"].flash(interval = 0.06)
-            self.wirecut_leds["green"].state = False
-            
-            print("Got here")
+            logging.debug("WIRECUT - Incorrect wire cut")
+            self.wirecut_show_state()
             
-            logging.debug(f"WIRECUT - Sending failure osc command to {CONFIG['osc_tx_client_ip']}:{CONFIG['osc_tx_client_port']}")
-            self.osc_controller.send_message("/escaperoom/challenge/4/failure", 1)
-            
-            print("Got here 2")
+            logging.debug("WIRECUT - Sending failure osc command to %s:%s", CONFIG['osc_tx_client_ip'], CONFIG['osc_tx_client_port'])
+            self.osc_controller.send_message("/escaperoom/challenge/4/failure", 1, reliable=True)
         
         elif self.wirecut__unlocked:
-            logging.debug(f"WIRECUT - Correct wire cut")
-            
-            for _, led in self.wirecut_leds.items():
-                led.stop_flashing()
-                
-            self.wirecut_leds["red1"].state = False
-            self.wirecut_leds["red2"].state = False
-            self.wirecut_leds["green"].state = True
+            logging.debug("WIRECUT - Correct wire cut")
+            self.wirecut_show_state()
             
             self.keypad_started = True # enable keypad
+        
+        self.save_state()
 
     
     def init_keypad(self):
@@ -212,67 +308,99 @@ class Handler():
             ["*", "0", "#"]
         ]
         
-        self.keypad_factory = rpi_gpio.KeypadFactory()
-        self.keypad_keypad = self.keypad_factory.create_keypad(keypad=self.keypad_keys, row_pins=CONFIG["keypad_row_pins"], col_pins=CONFIG["keypad_col_pins"])
-        
-        self.keypad_input = ""
-        self.keypad_strikes = 0
+        keypad_strikes = REGISTRY.counter("keypad_strikes_total")
         
         def handle_key(key):
-            logging.debug(f"KEYPAD - Key Pressed: {key}")
+            logging.debug("KEYPAD - Key Pressed: %s", key)
+            journal.record(journal.KEY, ord(key))
             
             if not self.keypad_started:
-                logging.debug(f"KEYPAD - Puzzle not started, ignoring")
+                logging.debug("KEYPAD - Puzzle not started, ignoring")
                 return
             
             if self.keypad_finished:
-                logging.debug(f"KEYPAD - Completed puzzle, ignoring")
+                logging.debug("KEYPAD - Completed puzzle, ignoring")
                 return
             
             if key in ["*", "#"]:  # Clear button
                 logging.debug("KEYPAD - Input cleared")
                 self.keypad_input = ""
+                self.save_state()
                 return
             
             self.keypad_input += key
-            logging.debug(f"KEYPAD - Current Input: {self.keypad_input}")
+            logging.debug("KEYPAD - Current Input: %s", self.keypad_input)
             
             if len(self.keypad_input) == 4:  # Check if 4 digits are entered
                 if int(self.keypad_input) == CONFIG["keypad_correct_code"]:
                     logging.debug("KEYPAD - Correct code entered")
-                    self.osc_controller.send_message("/escaperoom/challenge/4/success", 1)
+                    self.osc_controller.send_message("/escaperoom/challenge/4/success", 1, reliable=True)
                     self.keypad_finished = True
                 else:
                     logging.debug("KEYPAD - Incorrect code entered")
                     self.keypad_strikes += 1
+                    keypad_strikes.inc()
                     
                     if self.keypad_strikes >= CONFIG["keypad_attempts"]:
-                        logging.debug(f"KEYPAD - {CONFIG['keypad_attempts']} strikes reached")
-                        self.osc_controller.send_message("/escaperoom/challenge/4/failure", 1)
+                        logging.debug("KEYPAD - %s strikes reached", CONFIG['keypad_attempts'])
+                        self.osc_controller.send_message("/escaperoom/challenge/4/failure", 1, reliable=True)
                         self.keypad_finished = True
                         
                     else:
                         self.osc_controller.send_message("/escaperoom/challenge/4/keypad/incorrect", 1)
                         self.keypad_input = ""
+            
+            self.save_state()
         
-        self.keypad_keypad.registerKeyPressHandler(handle_key)
+        self.keypad_handle_key = self.runtime.bridge(handle_key)
+        self.keypad_arm()
+    
+    
+    def keypad_arm(self):
+        if CONFIG["keypad_driver"] == "matrix":
+            self.keypad_keypad = MatrixKeypad(
+                self.keypad_keys, CONFIG["keypad_row_pins"], CONFIG["keypad_col_pins"],
+                scan_interval=CONFIG["keypad_scan_interval"], debounce=CONFIG["debounce"]["keypad"], rollover=CONFIG["keypad_rollover"]
+            )
+        else:
+            from hardware import KeypadFactory # pad4pi is only imported when it drives the keypad
+            self.keypad_keypad = KeypadFactory().create_keypad(keypad=self.keypad_keys, row_pins=CONFIG["keypad_row_pins"], col_pins=CONFIG["keypad_col_pins"])
+        self.keypad_keypad.registerKeyPressHandler(self.keypad_handle_key)
+    
+    
+    def keypad_disarm(self, old: dict, changed: set[int]):
+        if old["keypad_driver"] == "matrix":
+            self.keypad_keypad.cleanup() # only cleans up the scanner's own pins
+            return
+        # pad4pi's cleanup() is a global GPIO.cleanup() that would reset every other pin in use
+        self.keypad_keypad.clearKeyPressHandlers()
+        pins = old["keypad_row_pins"] + old["keypad_col_pins"]
+        for pin in pins:
+            GPIO.remove_event_detect(pin)
+        released = [pin for pin in pins if pin in changed]
+        if released:
+            GPIO.cleanup(released)
     
     
     def init_vault_door(self):
         logging.debug("ELECTROMAGNET - Initializing Electromagnet Handler...")
         
-        relay_pin = 4
+        self.vault_relay_pin:int = CONFIG["vault_relay_pin"]
+        self.vault_locked:bool = self.restored.get("vault_locked", False)
         
-        GPIO.setup(relay_pin, GPIO.OUT)
-        GPIO.output(relay_pin, GPIO.LOW)
+        # already set up at the restored level by arm_gpio, so a locked door is never released for a moment
         
         def unlock(*args):
             logging.debug("ELECTROMAGNET - Unlocking door...")
-            GPIO.output(relay_pin, GPIO.LOW)
+            self.vault_locked = False
+            BANK.output(self.vault_relay_pin, False)
+            self.save_state()
             
         def lock(*args):
             logging.debug("ELECTROMAGNET - Locking door...")
-            GPIO.output(relay_pin, GPIO.HIGH)
+            self.vault_locked = True
+            BANK.output(self.vault_relay_pin, True)
+            self.save_state()
             
         self.osc_controller.add_handler("/escaperoom/vaultdoor/unlock", unlock)
         self.osc_controller.add_handler("/escaperoom/vaultdoor/lock", lock)
@@ -281,15 +409,102 @@ class Handler():
     def init_button(self):
         logging.debug("BUTTON - Initializing Button Handler...")
         
-        button_pin = 3
+        self.button_pin:int = CONFIG["button_pin"]
+        
+        self.debouncer.watch(self.button_pin, self.button_on_state_change, DebouncePolicy(settle=CONFIG["debounce"]["button"]))
+    
+    
+    def button_on_state_change(self, pin: int, level: bool):
+        logging.debug("BUTTON - button state changed")
+        self.osc_controller.send_message(f"/escaperoom/challenge/4/button/{'falling' if level else 'rising'}", 1)
+    
+    
+    def reload_config(self, *args):
+        if not self.config_file:
+            logging.warning("CONFIG - No config file to reload, set ESCAPEROOM_CONFIG_CHALLENGE4 or pass one on the command line")
+            return
         
-        def on_state_change(*args):
-            logging.debug("BUTTON - button state changed")
-            self.osc_controller.send_message(f"/escaperoom/challenge/4/button/{'falling' if GPIO.input(button_pin) == GPIO.HIGH else 'rising'}", 1)
+        try:
+            config = load(self.config_file)
+        except (OSError, ValueError) as e:
+            logging.error("CONFIG - Keeping the current config, failed to load %s: %s", self.config_file, e)
+            return
         
-        GPIO.setup(button_pin, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-        GPIO.add_event_detect(button_pin, GPIO.BOTH, callback=on_state_change, bouncetime=200)
+        keep_restart_keys(CONFIG, config)
+        self.apply_config(config)
+    
+    
+    def apply_config(self, config: dict):
+        # Only pins whose role changed are released and set up again, so wires and the keypad
+        # that kept their pins carry on without missing an edge
+        old = copy.deepcopy(CONFIG)
+        old_roles, new_roles = pin_roles(old), pin_roles(config)
+        changed = {pin for pin in old_roles.keys() | new_roles.keys() if old_roles.get(pin) != new_roles.get(pin)}
+        
+        CONFIG.clear()
+        CONFIG.update(config)
+        logging.info("CONFIG - Reloaded %s, re-arming GPIOs %s", self.config_file, sorted(changed) or "none")
+        
+        # release everything moving off a pin before anything claims it
+        wires = {wire.pin: wire for wire in self.wirecut_wires if wire.pin not in changed}
+        for wire in self.wirecut_wires:
+            if wire.pin in changed:
+                self.debouncer.unwatch(wire.pin)
+        
+        moved_leds = [name for name, pin in config["leds"].items() if pin in changed]
+        for name in moved_leds:
+            self.wirecut_leds[name].stop_flashing()
+            self.wirecut_leds[name].state = False
+        
+        keypad_keys = ["keypad_row_pins", "keypad_col_pins", "keypad_driver"]
+        if config["keypad_driver"] == "matrix": # the rest only reach the built-in scanner
+            keypad_keys += ["keypad_scan_interval", "keypad_rollover"]
+        keypad_moved = any(old[key] != config[key] for key in keypad_keys)
+        keypad_moved = keypad_moved or config["keypad_driver"] == "matrix" and old["debounce"]["keypad"] != config["debounce"]["keypad"]
+        if keypad_moved:
+            self.keypad_disarm(old, changed)
+        
+        if self.vault_relay_pin in changed:
+            BANK.output(self.vault_relay_pin, False)
+        
+        button_moved = self.button_pin in changed or old["debounce"]["button"] != config["debounce"]["button"]
+        if button_moved:
+            self.debouncer.unwatch(self.button_pin)
+        
+        # then set up the new roles
+        self.wirecut_wires = []
+        for entry in config["defuse_wires"]:
+            debounce = DebouncePolicy(settle=entry.get("settle", config["debounce"]["defuse_wires"]))
+            wire = wires.get(entry["pin"])
+            if wire is None:
+                wire = DiffusalWire(entry["pin"], entry["needs_cutting"], self, debounce)
+            else:
+                wire.needs_cutting = entry["needs_cutting"]
+                if wire.debounce.settle != debounce.settle:
+                    wire.debounce = debounce
+                    self.debouncer.unwatch(wire.pin)
+                    self.debouncer.watch(wire.pin, self.wirecut_on_state_change, debounce)
+            self.wirecut_wires.append(wire)
+        
+        for name in moved_leds:
+            self.wirecut_leds[name] = LEDIndicator(config["leds"][name])
+        
+        if keypad_moved:
+            self.keypad_arm()
+        
+        if config["vault_relay_pin"] != self.vault_relay_pin:
+            self.vault_relay_pin = config["vault_relay_pin"]
+            BANK.setup_output(self.vault_relay_pin, self.vault_locked)
+        
+        if button_moved:
+            BANK.setup_inputs([config["button_pin"]], GPIO.PUD_DOWN)
+            self.init_button()
+        
+        # a finished puzzle stays finished, otherwise the new wiring is checked straight away
+        if moved_leds:
+            self.wirecut_show_state()
+        self.wirecut_on_state_change()
         
 
 if __name__ == "__main__":
-    Handler()
\ No newline at end of file
+    Handler(config_file=sys.argv[1] if len(sys.argv) > 1 else None).run()
\ No newline at end of file
@@ -0,0 +1,92 @@
+import copy, json, logging, os
+
+# Challenge settings can be overridden from a TOML or JSON file. The file only has to contain
+# the keys it changes; everything else keeps the defaults from the challenge's CONFIG dict.
+
+
+def load_file(path: str) -> dict:
+    with open(path, "rb") as file:
+        if path.endswith(".toml"):
+            import tomllib
+            return tomllib.load(file)
+        if path.endswith(".json"):
+            return json.load(file)
+    raise ValueError(f"Unsupported config file type: {path}, expected .toml or .json")
+
+
+def load_config(path: str | None, defaults: dict, validate) -> dict:
+    config = copy.deepcopy(defaults)
+    if path:
+        overrides = load_file(path)
+        if not isinstance(overrides, dict):
+            raise ValueError(f"Config file {path} must hold a table of settings")
+        unknown = set(overrides) - set(defaults)
+        if unknown:
+            raise ValueError(f"Unknown config keys in {path}: {sorted(unknown)}")
+        for key, value in overrides.items():
+            # tables such as debounce or leds only need the entries they change
+            if isinstance(config[key], dict) and isinstance(value, dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+    validate(config)
+    return config
+
+
+def config_path(challenge_module: str) -> str | None:
+    # ESCAPEROOM_CONFIG_<MODULE> (e.g. ESCAPEROOM_CONFIG_CHALLENGE4) or ESCAPEROOM_CONFIG
+    return os.environ.get(f"ESCAPEROOM_CONFIG_{challenge_module.upper()}") or os.environ.get("ESCAPEROOM_CONFIG")
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        raise ValueError(f"Invalid config: {message}")
+
+
+def check_pin(pin, name: str):
+    check(isinstance(pin, int) and not isinstance(pin, bool) and 0 <= pin <= 27, f"{name} must be a BCM GPIO number 0-27, got {pin!r}")
+
+
+def check_settle(settle, name: str):
+    check(isinstance(settle, (int, float)) and not isinstance(settle, bool) and settle >= 0, f"{name} must be a non-negative number of seconds, got {settle!r}")
+
+
+def check_unique_pins(pins: list[int], name: str):
+    seen = set()
+    for pin in pins:
+        check(pin not in seen, f"GPIO {pin} is used more than once in {name}")
+        seen.add(pin)
+
+
+def check_common(config: dict):
+    check(isinstance(config["osc_rx_server_ip"], str), "osc_rx_server_ip must be a string")
+    check(isinstance(config["osc_tx_client_ip"], str), "osc_tx_client_ip must be a string")
+    for key in ("osc_rx_server_port", "osc_tx_client_port"):
+        check(isinstance(config[key], int) and 0 < config[key] < 65536, f"{key} must be a UDP port, got {config[key]!r}")
+    check(isinstance(config["osc_reliable"], bool), "osc_reliable must be true or false")
+    check(config["runtime"] in ("threaded", "asyncio"), f"runtime must be 'threaded' or 'asyncio', got {config['runtime']!r}")
+    check(config["journal_path"] is None or isinstance(config["journal_path"], str), "journal_path must be a file path")
+    check(isinstance(config["journal_records"], int) and config["journal_records"] > 0, "journal_records must be a positive number")
+    check(isinstance(config["heartbeat_interval"], (int, float)) and config["heartbeat_interval"] >= 0, "heartbeat_interval must be a number of seconds, 0 to disable")
+    check(config["profile_dir"] is None or isinstance(config["profile_dir"], str), "profile_dir must be a directory path")
+    check(isinstance(config["profile_interval"], (int, float)) and config["profile_interval"] > 0, "profile_interval must be a positive number of seconds")
+    check(isinstance(config["realtime"], bool), "realtime must be true or false")
+    check(isinstance(config["realtime_priority"], int) and 1 <= config["realtime_priority"] <= 99, "realtime_priority must be 1-99")
+    check(config["realtime_cpus"] is None or (isinstance(config["realtime_cpus"], list) and all(isinstance(cpu, int) and cpu >= 0 for cpu in config["realtime_cpus"])),
+          "realtime_cpus must be a list of CPU numbers")
+    check(isinstance(config["debounce"], dict), "debounce must be a table of settle windows per role")
+    for role, settle in config["debounce"].items():
+        check_settle(settle, f"debounce.{role}")
+
+
+RESTART_KEYS = ("osc_rx_server_ip", "osc_rx_server_port", "osc_tx_client_ip", "osc_tx_client_port", "osc_reliable", "runtime", "journal_path", "journal_records",
+                "realtime", "realtime_priority", "realtime_cpus")
+
+
+def keep_restart_keys(old: dict, new: dict):
+    # Sockets and the runtime cannot be swapped under a running handler, so these keep their
+    # current values until the process is restarted
+    for key in RESTART_KEYS:
+        if old.get(key) != new.get(key):
+            logging.warning("CONFIG - %s changed from %r to %r, takes effect after a restart", key, old.get(key), new.get(key))
+            new[key] = old[key]
@@ -0,0 +1,98 @@
+from hardware import GPIO
+import logging, time
+
+from metrics import REGISTRY
+from pinbank import BANK
+from realtime import REALTIME
+import journal
+
+
+class DebouncePolicy():
+    # settle: how long a pin must be quiet before its level is trusted
+    # bouncetime: optional extra filter applied by the GPIO driver itself (milliseconds)
+    def __init__(self, settle: float = 0.05, bouncetime: int | None = None):
+        self.settle:float = settle
+        self.bouncetime:int | None = bouncetime
+
+    def __repr__(self):
+        return f"DebouncePolicy(settle={self.settle}, bouncetime={self.bouncetime})"
+
+
+class _Watch():
+    def __init__(self, pin: int, handler, policy: DebouncePolicy, level: bool):
+        self.pin = pin
+        self.handler = handler
+        self.policy = policy
+        self.level = level
+        self.last_edge = 0.0
+        self.armed = False # a settle timer is pending for this pin
+        self.edges = REGISTRY.counter("gpio_edges_total", pin=pin)
+        self.duration = REGISTRY.histogram("gpio_handler_seconds", pin=pin) # the settled handler, not the raw edge callback
+
+
+class Debouncer():
+    # The GPIO callback only timestamps the raw edge on the pin's watch, and arms a settle timer
+    # on the runtime when none is pending, so a bouncing contact costs one timer rather than one
+    # per bounce and later edges take no lock. When the timer fires before the pin has been quiet
+    # for its settle window it re-arms for the rest of it; once quiet, the settled level is
+    # delivered to the handler as handler(pin, level) - on the runtime's timer thread or loop.
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.__watches:dict[int, _Watch] = {}
+
+    def watch(self, pin: int, handler, policy: DebouncePolicy | None = None):
+        policy = policy or DebouncePolicy()
+        logging.debug("DEBOUNCE - Watching pin %s with %s", pin, policy)
+
+        self.__watches[pin] = _Watch(pin, handler, policy, BANK.level(pin)) # one bank read for a batch inside BANK.snapshot()
+        journal.record(journal.LEVEL, pin, int(self.__watches[pin].level))
+
+        if policy.bouncetime:
+            GPIO.add_event_detect(pin, GPIO.BOTH, callback=self.__on_edge, bouncetime=policy.bouncetime)
+        else:
+            GPIO.add_event_detect(pin, GPIO.BOTH, callback=self.__on_edge)
+
+    def unwatch(self, pin: int):
+        if self.__watches.pop(pin, None) is not None:
+            logging.debug("DEBOUNCE - No longer watching pin %s", pin)
+            GPIO.remove_event_detect(pin)
+
+    def level(self, pin: int) -> bool:
+        return self.__watches[pin].level
+
+    def __on_edge(self, pin: int):
+        REALTIME.promote("gpio")
+        watch = self.__watches.get(pin)
+        if watch is None:
+            return
+
+        watch.edges.inc()
+        if journal.JOURNAL is not None: # the extra read is only paid while recording
+            journal.record(journal.EDGE, pin, GPIO.input(pin))
+        watch.last_edge = time.monotonic()
+        if not watch.armed:
+            watch.armed = True
+            self.runtime.call_later(watch.policy.settle, self.__settle, watch)
+
+    def __settle(self, watch: _Watch):
+        # disarmed before the check, so an edge landing after it arms a timer of its own
+        watch.armed = False
+        if self.__watches.get(watch.pin) is not watch:
+            return # unwatched, or watched again with a new policy
+
+        remaining = watch.last_edge + watch.policy.settle - time.monotonic()
+        if remaining > watch.policy.settle * 0.01:
+            watch.armed = True # still bouncing, wait out the rest of the window
+            self.runtime.call_later(remaining, self.__settle, watch)
+            return
+
+        level = GPIO.input(watch.pin) == GPIO.HIGH
+        if level == watch.level:
+            return # bounced back to where it was
+
+        watch.level = level
+        start = time.perf_counter()
+        try:
+            watch.handler(watch.pin, level)
+        finally:
+            watch.duration.observe(time.perf_counter() - start)
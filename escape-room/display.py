@@ -0,0 +1,95 @@
+import logging, threading, time
+
+from realtime import REALTIME
+
+
+class LCDFramebuffer():
+    # Shadow copy of the character LCD. render() only records the wanted screen and returns;
+    # a renderer thread applies it at most `fps` times a second by writing just the cells that
+    # differ. Each character and each cursor move is one byte on the I2C expander, so runs on a
+    # row separated by a gap of CURSOR_MOVE_COST cells or fewer are merged and the unchanged
+    # cells rewritten, which is never more bytes than jumping the cursor over them.
+    CURSOR_MOVE_COST = 1
+
+    def __init__(self, lcd, cols: int = 20, rows: int = 4, fps: float = 20, clear: bool = True):
+        self.lcd = lcd
+        self.cols:int = cols
+        self.rows:int = rows
+        self.frame_interval:float = 1 / fps
+
+        self.__shadow:list[list[str]] = [[" "] * cols for _ in range(rows)]
+        self.__cursor:tuple[int, int] | None = None
+        self.__pending:list[str] | None = None
+        self.__lock = threading.Lock()
+        self.__write_lock = threading.Lock()
+        self.__dirty = threading.Event()
+
+        if clear:
+            self.lcd.clear()
+            self.__cursor = (0, 0)
+
+        self.__thread = threading.Thread(target=self.__run, name="LCDFramebuffer", daemon=True)
+        self.__thread.start()
+
+    def render(self, lines: list[str] | str):
+        if isinstance(lines, str):
+            lines = lines.split("\n")
+        lines = [str(line)[:self.cols].ljust(self.cols) for line in lines[:self.rows]]
+        lines += [" " * self.cols] * (self.rows - len(lines))
+
+        with self.__lock:
+            self.__pending = lines
+        self.__dirty.set()
+
+    def flush(self):
+        # The write lock is held from taking the pending frame until it is on the display, so a
+        # flush() that finds nothing pending only returns once the renderer has written it
+        with self.__write_lock:
+            with self.__lock:
+                lines, self.__pending = self.__pending, None
+            if lines is not None:
+                self.__apply(lines)
+
+    @property
+    def lines(self) -> list[str]:
+        return ["".join(row) for row in self.__shadow]
+
+    def runs(self, row: int, line: str) -> list[tuple[int, int]]:
+        shadow = self.__shadow[row]
+        runs:list[tuple[int, int]] = []
+        for col in range(self.cols):
+            if line[col] == shadow[col]:
+                continue
+            if runs and col - runs[-1][1] <= self.CURSOR_MOVE_COST:
+                runs[-1] = (runs[-1][0], col + 1)
+            else:
+                runs.append((col, col + 1))
+        return runs
+
+    def __apply(self, lines: list[str]):
+        # called by flush() with the write lock held
+        for row, line in enumerate(lines):
+            for start, end in self.runs(row, line):
+                if self.__cursor != (row, start):
+                    self.lcd.cursor_pos = (row, start)
+                self.lcd.write_string(line[start:end])
+                self.__shadow[row][start:end] = line[start:end]
+                # the controller's address counter does not wrap onto the next row
+                self.__cursor = (row, end) if end < self.cols else None
+
+    def __run(self):
+        REALTIME.release()
+        while True:
+            self.__dirty.wait()
+            self.__dirty.clear()
+            started = time.monotonic()
+
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error("LCD - Failed to refresh display: %s", e)
+                self.__cursor = None
+
+            remaining = started + self.frame_interval - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
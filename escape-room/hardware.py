@@ -0,0 +1,40 @@
+import os
+
+# Hardware backend selection. ESCAPEROOM_BACKEND=sim swaps RPi.GPIO, pad4pi and RPLCD for the
+# in-process simulation in sim.py so the handlers run on any Linux box. Each name is resolved on
+# first use, so a challenge only imports the drivers it actually touches.
+BACKEND = os.environ.get("ESCAPEROOM_BACKEND", "pi")
+
+BACKENDS = ("pi", "sim")
+
+if BACKEND not in BACKENDS:
+    raise ValueError(f"Unknown ESCAPEROOM_BACKEND: {BACKEND}, expected one of {list(BACKENDS)}")
+
+
+def __getattr__(name: str):
+    if name == "GPIO":
+        if BACKEND == "sim":
+            from sim import GPIO
+        else:
+            import RPi.GPIO as GPIO # type: ignore
+        value = GPIO
+
+    elif name == "KeypadFactory":
+        if BACKEND == "sim":
+            from sim import KeypadFactory
+        else:
+            from pad4pi.rpi_gpio import KeypadFactory # type: ignore
+        value = KeypadFactory
+
+    elif name == "CharLCD":
+        if BACKEND == "sim":
+            from sim import CharLCD
+        else:
+            from RPLCD.i2c import CharLCD # type: ignore
+        value = CharLCD
+
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
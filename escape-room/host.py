@@ -0,0 +1,84 @@
+from hardware import GPIO
+import importlib, logging, signal
+
+from osc import OSCController
+from runtime import create_runtime, post_on_signal
+from logs import configure_logging
+from config import config_path
+
+# Runs several challenges in one process. Each challenge module is a plugin exposing
+#   CHALLENGE        its OSC namespace, e.g. "challenge/4"
+#   CONFIG           its pin map and settings
+#   claimed_pins()   every GPIO it sets up
+#   load(path)       its CONFIG merged with a config file
+#   Handler(osc_controller, config_file)
+# The host owns the single GPIO session, the OSC receive socket (routed per address by the
+# shared dispatcher) and the OSC sender.
+
+configure_logging(level=logging.DEBUG)
+
+
+class Host():
+    def __init__(self, challenges: list[str], rx_ip: str | None = None, rx_port: int | None = None,
+                 tx_ip: str | None = None, tx_port: int | None = None, runtime: str | None = None,
+                 config_files: dict[str, str] | None = None, reliable: bool = False):
+        logging.debug("HOST - Loading challenges: %s", challenges)
+        self.plugins = [importlib.import_module(name) for name in challenges]
+        self.config_files = {name: (config_files or {}).get(name) or config_path(name) for name in challenges}
+        for plugin in self.plugins:
+            plugin.CONFIG.update(plugin.load(self.config_files[plugin.__name__]))
+        self.check_pins()
+
+        config = self.plugins[0].CONFIG
+        GPIO.setmode(GPIO.BCM)
+        self.osc_controller = OSCController(
+            rx_ip or config["osc_rx_server_ip"], rx_port or config["osc_rx_server_port"],
+            tx_ip or config["osc_tx_client_ip"], tx_port or config["osc_tx_client_port"],
+            runtime=create_runtime(runtime or config["runtime"]), reliable=reliable or config["osc_reliable"]
+        )
+
+        self.handlers = []
+        for plugin in self.plugins:
+            logging.debug("HOST - Starting %s", plugin.CHALLENGE)
+            self.osc_controller.owner = plugin.CHALLENGE
+            self.handlers.append(plugin.Handler(osc_controller=self.osc_controller, config_file=self.config_files[plugin.__name__]))
+        self.osc_controller.owner = None
+        
+        post_on_signal(self.osc_controller.runtime, signal.SIGHUP, self.reload_config)
+
+    def check_pins(self):
+        claimed:dict[int, str] = {}
+        conflicts = []
+        for plugin in self.plugins:
+            for pin in sorted(plugin.claimed_pins()):
+                if pin in claimed:
+                    conflicts.append(f"GPIO {pin} ({claimed[pin]} and {plugin.CHALLENGE})")
+                else:
+                    claimed[pin] = plugin.CHALLENGE
+
+        if conflicts:
+            raise ValueError(f"Challenges claim the same pins: {', '.join(conflicts)}")
+
+    def reload_config(self):
+        for handler in self.handlers:
+            handler.reload_config()
+
+    def run(self):
+        self.osc_controller.start_server()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run several escape room challenges in one process")
+    parser.add_argument("challenges", nargs="+", help="challenge modules to load, e.g. challenge1 challenge4")
+    parser.add_argument("--rx-ip")
+    parser.add_argument("--rx-port", type=int)
+    parser.add_argument("--tx-ip")
+    parser.add_argument("--tx-port", type=int)
+    parser.add_argument("--runtime", choices=["threaded", "asyncio"])
+    parser.add_argument("--reliable", action="store_true", help="acknowledged OSC delivery, see osc.ReliableLink")
+    parser.add_argument("--config", action="append", default=[], metavar="MODULE=PATH", help="config file for one challenge, e.g. challenge4=challenge4.toml")
+    args = parser.parse_args()
+
+    config_files = dict(entry.split("=", 1) for entry in args.config)
+    Host(args.challenges, args.rx_ip, args.rx_port, args.tx_ip, args.tx_port, args.runtime, config_files, args.reliable).run()
@@ -0,0 +1,142 @@
+import logging, mmap, os, struct, threading, time
+
+# Fixed-size binary journal of everything that drives or leaves a challenge: raw GPIO edges,
+# key presses and OSC messages in both directions. It is a ring of 12-byte records in a
+# memory-mapped file, so recording is two struct.pack_into under a lock and no system call;
+# replay.py feeds a recorded game back into a handler.
+#
+#   record   <QHBB   monotonic_ns, id, kind, value
+#   EDGE     id = pin, value = level read in the edge callback
+#   LEVEL    id = pin, value = level when the pin started being watched
+#   KEY      id = ord(key)
+#   OSC_IN   id = address in the string table, value = first argument if it is an int 0-254, else 255
+#   OSC_OUT  as OSC_IN
+#   SESSION  written when the journal is opened; a file keeps appending across restarts
+
+SESSION, EDGE, LEVEL, KEY, OSC_IN, OSC_OUT = range(6)
+KIND_NAMES = {SESSION: "session", EDGE: "edge", LEVEL: "level", KEY: "key", OSC_IN: "osc_in", OSC_OUT: "osc_out"}
+NO_VALUE = 255
+NO_STRING = 0xFFFF
+
+
+class Journal():
+    MAGIC = b"ERJ1"
+    HEADER = struct.Struct("<4sIIQI") # magic, capacity, string table size, records written, string table used
+    COUNT_OFFSET = 12
+    USED_OFFSET = 20
+    HEADER_SIZE = 64
+    RECORD = struct.Struct("<QHBB")
+
+    def __init__(self, path: str, capacity: int = 65536, strings_size: int = 16384):
+        self.path = path
+        size = self.HEADER_SIZE + strings_size + capacity * self.RECORD.size
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing != size:
+                os.ftruncate(fd, size)
+            self.__map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, stored_capacity, stored_strings, count, used = self.HEADER.unpack_from(self.__map, 0)
+        if magic != self.MAGIC or stored_capacity != capacity or stored_strings != strings_size:
+            # new file, or one written with a different layout
+            self.__map[:self.HEADER_SIZE + strings_size] = bytes(self.HEADER_SIZE + strings_size)
+            count, used = 0, 0
+            self.HEADER.pack_into(self.__map, 0, self.MAGIC, capacity, strings_size, count, used)
+
+        self.capacity:int = capacity
+        self.strings_size:int = strings_size
+        self.records_offset:int = self.HEADER_SIZE + strings_size
+        self.strings:list[str] = self.__read_strings(used)
+        self.__string_ids:dict[str, int] = {value: index for index, value in enumerate(self.strings)}
+        self.__strings_used:int = used
+        self.__count:int = count
+        self.__lock = threading.Lock()
+
+        self.record(SESSION)
+
+    def __read_strings(self, used: int) -> list[str]:
+        table = bytes(self.__map[self.HEADER_SIZE:self.HEADER_SIZE + used])
+        return [value.decode() for value in table.split(b"\0")[:-1]] if used else []
+
+    def intern(self, value: str) -> int:
+        index = self.__string_ids.get(value)
+        if index is not None:
+            return index
+
+        with self.__lock:
+            if value in self.__string_ids:
+                return self.__string_ids[value]
+            encoded = value.encode() + b"\0"
+            if self.__strings_used + len(encoded) > self.strings_size or len(self.strings) >= NO_STRING:
+                return NO_STRING
+            start = self.HEADER_SIZE + self.__strings_used
+            self.__map[start:start + len(encoded)] = encoded
+            self.__strings_used += len(encoded)
+            struct.pack_into("<I", self.__map, self.USED_OFFSET, self.__strings_used)
+            self.strings.append(value)
+            self.__string_ids[value] = len(self.strings) - 1
+            return len(self.strings) - 1
+
+    def record(self, kind: int, ident: int = 0, value: int = 0):
+        timestamp = time.monotonic_ns()
+        # the header count is written with the record it covers, so a concurrent append can
+        # never leave a smaller count over a larger one
+        with self.__lock:
+            sequence = self.__count
+            self.__count = sequence + 1
+            self.RECORD.pack_into(self.__map, self.records_offset + (sequence % self.capacity) * self.RECORD.size, timestamp, ident, kind, value)
+            struct.pack_into("<Q", self.__map, self.COUNT_OFFSET, sequence + 1)
+
+    def flush(self):
+        self.__map.flush()
+
+
+def read_journal(path: str) -> tuple[list[str], list[tuple[int, int, int, int]]]:
+    # Returns the string table and the surviving records, oldest first, as
+    # (timestamp, kind, id, value)
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic, capacity, strings_size, count, used = Journal.HEADER.unpack_from(data, 0)
+    if magic != Journal.MAGIC:
+        raise ValueError(f"{path} is not an escape room journal")
+
+    table = data[Journal.HEADER_SIZE:Journal.HEADER_SIZE + used]
+    strings = [value.decode() for value in table.split(b"\0")[:-1]] if used else []
+
+    offset = Journal.HEADER_SIZE + strings_size
+    first = max(0, count - capacity)
+    records = []
+    for sequence in range(first, count):
+        timestamp, ident, kind, value = Journal.RECORD.unpack_from(data, offset + (sequence % capacity) * Journal.RECORD.size)
+        if timestamp:
+            records.append((timestamp, kind, ident, value))
+    return strings, records
+
+
+JOURNAL:Journal | None = None
+
+
+def open_journal(path: str | None, capacity: int = 65536) -> Journal | None:
+    # Idempotent, like configure_logging: challenges sharing a process share one journal
+    global JOURNAL
+    if path and JOURNAL is None:
+        JOURNAL = Journal(path, capacity)
+        logging.info("JOURNAL - Recording to %s (%s records)", path, capacity)
+    return JOURNAL
+
+
+def record(kind: int, ident: int = 0, value: int = 0):
+    if JOURNAL is not None:
+        JOURNAL.record(kind, ident, value)
+
+
+def record_osc(kind: int, address: str, args):
+    if JOURNAL is not None:
+        first = args[0] if args else None
+        value = first if isinstance(first, int) and not isinstance(first, bool) and 0 <= first < NO_VALUE else NO_VALUE
+        JOURNAL.record(kind, JOURNAL.intern(address), value)
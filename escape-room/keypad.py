@@ -0,0 +1,198 @@
+from hardware import GPIO
+import logging, queue, threading, time
+
+from metrics import REGISTRY
+from realtime import REALTIME
+
+KEYS = [
+    ["1", "2", "3"],
+    ["4", "5", "6"],
+    ["7", "8", "9"],
+    ["*", "0", "#"]
+]
+
+
+class KeyEvent():
+    def __init__(self, key: str, pressed: bool, timestamp: int, detected: int):
+        self.key:str = key
+        self.pressed:bool = pressed
+        self.timestamp:int = timestamp # monotonic_ns when the debounced change was accepted
+        self.detected:int = detected   # monotonic_ns of the interrupt or scan that first saw it
+
+    def __repr__(self):
+        return f"KeyEvent(key={self.key!r}, pressed={self.pressed}, latency={(self.timestamp - self.detected) / 1e6:.2f}ms)"
+
+
+class MatrixKeypad():
+    # Interrupt-driven scanner for a matrix keypad with the pad4pi keypad interface. While idle
+    # every row is driven LOW, the columns are pulled up, and the scanner thread sleeps until a
+    # column falls. It then scans one row at a time every `scan_interval` until all keys have
+    # been up for `debounce`, and goes back to sleep. Debounced events go into a bounded queue
+    # (`events`); a separate thread hands key presses to the registered handlers, so a slow
+    # handler delays delivery but never the scan.
+    #
+    # Without diodes, three keys on the corners of a rectangle make the fourth corner read as
+    # pressed too. Scans showing a rectangle are ignored until it clears, and at most `rollover`
+    # keys are reported down at once (None for no limit).
+    def __init__(self, keys: list[list[str]], row_pins: list[int], col_pins: list[int], scan_interval: float = 0.002,
+                 debounce: float = 0.02, rollover: int | None = 2, queue_size: int = 64):
+        self.keys = keys
+        self.row_pins = row_pins
+        self.col_pins = col_pins
+        self.scan_interval:float = scan_interval
+        self.debounce:float = debounce
+        self.rollover:int | None = rollover
+        self.handlers:list = []
+        self.events:queue.Queue[KeyEvent] = queue.Queue(maxsize=queue_size)
+
+        self.scans = REGISTRY.counter("keypad_scans_total")
+        self.ghosts = REGISTRY.counter("keypad_ghosts_total")
+        self.overflow = REGISTRY.counter("keypad_rollover_total")
+        self.dropped = REGISTRY.counter("keypad_dropped_total")
+        self.latency = REGISTRY.histogram("keypad_latency_seconds")
+
+        self.__running = True
+        self.__wake = threading.Event()
+        self.__woken_at:int = 0
+
+        GPIO.setup(self.row_pins, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self.col_pins, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        for pin in self.col_pins:
+            GPIO.add_event_detect(pin, GPIO.FALLING, callback=self.__on_edge)
+
+        self.__scanner = threading.Thread(target=self.__run_scanner, name="MatrixKeypadScan", daemon=True)
+        self.__dispatcher = threading.Thread(target=self.__run_dispatcher, name="MatrixKeypadDispatch", daemon=True)
+        self.__scanner.start()
+        self.__dispatcher.start()
+
+    # pad4pi keypad interface
+
+    def registerKeyPressHandler(self, handler):
+        self.handlers.append(handler)
+
+    def unregisterKeyPressHandler(self, handler):
+        self.handlers.remove(handler)
+
+    def clearKeyPressHandlers(self):
+        self.handlers = []
+
+    def cleanup(self):
+        self.__running = False
+        self.clearKeyPressHandlers()
+        for pin in self.col_pins:
+            GPIO.remove_event_detect(pin)
+        self.__wake.set()
+        self.__scanner.join(1)
+        try:
+            self.events.put_nowait(None)
+        except queue.Full:
+            pass
+        GPIO.cleanup(self.row_pins + self.col_pins)
+
+    # scanning
+
+    def __on_edge(self, channel: int):
+        if not self.__wake.is_set():
+            self.__woken_at = time.monotonic_ns()
+            self.__wake.set()
+
+    def scan(self) -> set[tuple[int, int]]:
+        down = set()
+        for r in range(len(self.row_pins)):
+            GPIO.output(self.row_pins, [GPIO.LOW if i == r else GPIO.HIGH for i in range(len(self.row_pins))])
+            for c, pin in enumerate(self.col_pins):
+                if GPIO.input(pin) == GPIO.LOW:
+                    down.add((r, c))
+        GPIO.output(self.row_pins, GPIO.LOW)
+        self.scans.inc()
+        return down
+
+    @staticmethod
+    def ghosted(down: set[tuple[int, int]]) -> bool:
+        columns:dict[int, set[int]] = {}
+        for r, c in down:
+            columns.setdefault(r, set()).add(c)
+        rows = list(columns.values())
+        return any(len(rows[i] & rows[j]) >= 2 for i in range(len(rows)) for j in range(i + 1, len(rows)))
+
+    def __idle(self) -> bool:
+        return all(GPIO.input(pin) == GPIO.HIGH for pin in self.col_pins)
+
+    def __run_scanner(self):
+        REALTIME.promote("keypad")
+        stable:list[tuple[int, int]] = [] # debounced keys that are down, in the order they went down
+        ignored:set[tuple[int, int]] = set() # keys held past the rollover limit, until released
+        while self.__running:
+            # arm before checking, so an edge between the check and the wait is not lost
+            self.__woken_at = 0
+            self.__wake.clear()
+            if self.__idle():
+                self.__wake.wait()
+                if not self.__running:
+                    return
+            detected = self.__woken_at or time.monotonic_ns()
+
+            candidate:set[tuple[int, int]] | None = None
+            since:int = detected       # when the raw scan last changed
+            seen:int | None = detected # when the pending change was first seen
+            while self.__running:
+                raw = self.scan()
+                now = time.monotonic_ns()
+
+                if self.ghosted(raw):
+                    self.ghosts.inc()
+                    raw = None
+                    since = now
+                if raw != candidate:
+                    since = now if candidate is not None else since
+                    candidate = raw
+                if seen is None and candidate is not None and candidate != set(stable) | ignored:
+                    seen = now
+
+                settled = candidate is not None and now - since >= self.debounce * 1e9
+                if settled and candidate != set(stable) | ignored:
+                    ignored &= candidate
+                    stable = self.__accept(stable, ignored, candidate, now, seen)
+                    seen = None
+                if settled and not candidate:
+                    break
+                time.sleep(self.scan_interval)
+
+    def __accept(self, stable: list[tuple[int, int]], ignored: set[tuple[int, int]], candidate: set[tuple[int, int]], now: int, detected: int) -> list[tuple[int, int]]:
+        for position in [position for position in stable if position not in candidate]:
+            stable.remove(position)
+            self.__emit(position, False, now, detected)
+
+        for position in sorted(candidate - set(stable) - ignored):
+            if self.rollover is not None and len(stable) >= self.rollover:
+                self.overflow.inc()
+                ignored.add(position)
+                continue
+            stable.append(position)
+            self.__emit(position, True, now, detected)
+        return stable
+
+    def __emit(self, position: tuple[int, int], pressed: bool, now: int, detected: int):
+        r, c = position
+        event = KeyEvent(self.keys[r][c], pressed, now, detected)
+        if pressed:
+            self.latency.observe((now - detected) / 1e9)
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.dropped.inc()
+            logging.warning("KEYPAD - Event queue full, dropped %s", event)
+
+    def __run_dispatcher(self):
+        REALTIME.release()
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            if not event.pressed:
+                continue
+            for handler in list(self.handlers):
+                try:
+                    handler(event.key)
+                except Exception as e:
+                    logging.error("KEYPAD - Key handler failed for key %r: %s", event.key, e)
@@ -0,0 +1,93 @@
+import atexit, collections, logging, logging.handlers, os, queue
+
+FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler formats the message on the calling thread before queueing it.
+    # Records are passed through untouched instead, so %-style arguments are only interpolated
+    # on the listener thread (callers must not mutate objects they pass as log arguments).
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class RingBufferHandler(logging.Handler):
+    def __init__(self, capacity: int = 1000):
+        super().__init__()
+        self.records:collections.deque[str] = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(FORMAT))
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.records.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def recent(self, count: int | None = None) -> list[str]:
+        records = list(self.records)
+        return records if count is None else records[-count:]
+
+
+RING_BUFFER:RingBufferHandler | None = None
+_listener:logging.handlers.QueueListener | None = None
+
+
+def configure_logging(level: int = logging.DEBUG, mode: str | None = None, ring_size: int = 1000):
+    # mode "queue" (default): callers only enqueue the record; formatting, the ring buffer and
+    # stream I/O happen on a background listener thread. mode "sync": the old basicConfig setup.
+    global RING_BUFFER, _listener
+
+    root = logging.getLogger()
+    if RING_BUFFER is not None:
+        return # already configured, e.g. by another challenge loaded in the same process
+
+    mode = mode or os.environ.get("ESCAPEROOM_LOG_MODE", "queue")
+    if mode not in ("queue", "sync"):
+        raise ValueError(f"Unknown logging mode: {mode}, expected 'queue' or 'sync'")
+
+    root.setLevel(level)
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(FORMAT))
+    RING_BUFFER = RingBufferHandler(ring_size)
+
+    if mode == "queue":
+        records:queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(DeferredQueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, stream, RING_BUFFER, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+    else:
+        root.addHandler(stream)
+        root.addHandler(RING_BUFFER)
+
+
+def serve_logging(osc_controller, challenge: str):
+    # /escaperoom/<challenge>/log/level <name or number>  changes the root level at runtime
+    # /escaperoom/<challenge>/log/dump [count]            replies with recent records, one per message
+    prefix = f"/escaperoom/{challenge}/log"
+
+    def set_level(address: str, *args):
+        if not args:
+            logging.warning("LOG - Level change requested without a level")
+            return
+
+        level = args[0]
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            logging.warning("LOG - Unknown log level requested: %r", args[0])
+            return
+
+        logging.getLogger().setLevel(level)
+        logging.warning("LOG - Log level set to %s", logging.getLevelName(level))
+
+    def dump(client_address, address: str, *args):
+        count = int(args[0]) if args else 100
+        records = RING_BUFFER.recent(count) if RING_BUFFER is not None else []
+        for record in records:
+            osc_controller.sender.send(f"{prefix}/record", record, target=client_address)
+        osc_controller.sender.send(f"{prefix}/end", len(records), target=client_address)
+
+    osc_controller.add_handler(f"{prefix}/level", set_level)
+    osc_controller.add_handler(f"{prefix}/dump", dump, needs_reply_address=True)
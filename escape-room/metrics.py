@@ -0,0 +1,161 @@
+import bisect, functools, json, logging, os, time
+
+# Fixed latency buckets in seconds, 50us .. 1s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Counter():
+    __slots__ = ("name", "labels", "value")
+
+    def __init__(self, name: str, labels: dict[str, str]):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge():
+    __slots__ = ("name", "labels", "callback")
+
+    def __init__(self, name: str, labels: dict[str, str], callback):
+        self.name = name
+        self.labels = labels
+        self.callback = callback
+
+    def snapshot(self):
+        try:
+            return self.callback()
+        except Exception as e:
+            logging.error("METRICS - Gauge %s failed: %s", self.name, e)
+            return None
+
+
+class Histogram():
+    # Recording is one bisect over a short tuple and two in-place adds, no allocation and no lock
+    __slots__ = ("name", "labels", "bounds", "counts", "sum")
+
+    def __init__(self, name: str, labels: dict[str, str], bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        return {
+            "count": sum(self.counts),
+            "sum": self.sum,
+            "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts)),
+        }
+
+
+class Registry():
+    def __init__(self):
+        self.metrics:dict[tuple[str, tuple], Counter | Gauge | Histogram] = {}
+
+    def __get(self, kind, name: str, labels: dict, *args):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            metric = self.metrics[key] = kind(name, dict(key[1]), *args)
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self.__get(Counter, name, labels)
+
+    def gauge(self, name: str, callback, **labels) -> Gauge:
+        return self.__get(Gauge, name, labels, callback)
+
+    def histogram(self, name: str, bounds: tuple[float, ...] = LATENCY_BUCKETS, **labels) -> Histogram:
+        return self.__get(Histogram, name, labels, bounds)
+
+    def snapshot(self) -> dict:
+        snapshot = {}
+        for (name, labels), metric in list(self.metrics.items()):
+            key = name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+            snapshot[key] = metric.snapshot()
+        return snapshot
+
+    def prometheus(self) -> str:
+        lines = []
+        typed = set()
+        for (name, labels), metric in sorted(self.metrics.items(), key=lambda item: item[0]):
+            kind = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}[type(metric)]
+            if name not in typed:
+                lines.append(f"# TYPE {name} {kind}")
+                typed.add(name)
+
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            suffix = f"{{{label_text}}}" if label_text else ""
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, count in zip([*map(str, metric.bounds), "+Inf"], metric.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_text}{"," if label_text else ""}le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{suffix} {metric.sum}")
+                lines.append(f"{name}_count{suffix} {cumulative}")
+            else:
+                value = metric.snapshot()
+                if value is not None:
+                    lines.append(f"{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        # Written to a temporary file and renamed so a textfile collector never reads half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.prometheus())
+        os.replace(temporary, path)
+
+
+REGISTRY = Registry()
+
+
+def timed(name: str, **labels):
+    histogram = REGISTRY.histogram(name, **labels)
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def serve_metrics(osc_controller, challenge: str, prometheus_path: str | None = None, prometheus_interval: float = 15, registry: Registry = REGISTRY):
+    # Replies to /escaperoom/<challenge>/metrics with the snapshot as a JSON string, sent back to
+    # the address the query came from, and optionally keeps a Prometheus text file up to date
+    address = f"/escaperoom/{challenge}/metrics"
+
+    def write():
+        try:
+            registry.write_prometheus(prometheus_path)
+        except OSError as e:
+            logging.error("METRICS - Failed to write %s: %s", prometheus_path, e)
+
+    def query(client_address, *args):
+        logging.debug("METRICS - Snapshot requested by %s:%s", client_address[0], client_address[1])
+        osc_controller.sender.send(f"{address}/snapshot", json.dumps(registry.snapshot(), separators=(",", ":")), target=client_address)
+        if prometheus_path:
+            write()
+
+    def periodic():
+        write()
+        osc_controller.runtime.call_later(prometheus_interval, periodic)
+
+    osc_controller.add_handler(address, query, needs_reply_address=True)
+    if prometheus_path:
+        osc_controller.runtime.call_later(prometheus_interval, periodic)
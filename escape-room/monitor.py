@@ -0,0 +1,240 @@
+from pythonosc.osc_packet import OscPacket, ParseError
+import argparse, asyncio, atexit, itertools, json, os, socket, subprocess, sys, tempfile, time
+
+from osc import OSCSender
+from status import HEARTBEAT_ADDRESS
+
+# Fleet monitor for every challenge on the show network. Handlers are discovered from their
+# /escaperoom/heartbeat broadcasts; status queries and resets are fanned out concurrently from
+# one UDP socket, and the replies are shown as a live table.
+#
+#   python monitor.py                         watch the fleet (listens on the handlers' tx port)
+#   python monitor.py --reset challenge/4     reset every challenge 4 node, then show the table
+#   python monitor.py --spawn-sim 20          start 20 simulated handlers locally and watch them
+#
+# Memory is bounded: at most --max-nodes nodes are tracked (the longest silent is evicted),
+# nodes silent for --forget seconds are dropped, and a query that times out is forgotten.
+
+
+class Node():
+    def __init__(self, ip: str, port: int, challenge: str):
+        self.ip = ip
+        self.port = port
+        self.challenge = challenge
+        self.hostname = ""
+        self.uptime = 0.0
+        self.last_seen = 0.0
+        self.beats = 0
+        self.missed = 0       # heartbeats that never arrived
+        self.latency:float | None = None     # last status round trip, seconds
+        self.latency_avg:float | None = None
+        self.timeouts = 0
+        self.state:dict = {}
+
+    @property
+    def key(self) -> tuple[str, int, str]:
+        return (self.ip, self.port, self.challenge)
+
+    def heartbeat(self, hostname: str, uptime: float, beats: int):
+        if beats > self.beats + 1 and self.beats and uptime >= self.uptime:
+            self.missed += beats - self.beats - 1
+        self.hostname = hostname
+        self.uptime = uptime
+        self.beats = beats
+        self.last_seen = time.monotonic()
+
+    def replied(self, latency: float, state: dict):
+        self.latency = latency
+        self.latency_avg = latency if self.latency_avg is None else 0.8 * self.latency_avg + 0.2 * latency
+        self.state = state
+
+
+class FleetProtocol(asyncio.DatagramProtocol):
+    def __init__(self, monitor: "Monitor"):
+        self.monitor = monitor
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]):
+        self.monitor.receive(data, addr)
+
+
+class Monitor():
+    def __init__(self, ip: str = "0.0.0.0", port: int = 10000, max_nodes: int = 1024, timeout: float = 1.0,
+                 concurrency: int = 128, forget: float = 60):
+        self.ip = ip
+        self.port = port
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.forget = forget
+        self.nodes:dict[tuple[str, int, str], Node] = {}
+        self.transport:asyncio.DatagramTransport | None = None
+
+        self.__tokens = itertools.count(1)
+        self.__pending:dict[int, tuple[asyncio.Future, float]] = {}
+        self.__semaphore = asyncio.Semaphore(concurrency)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: FleetProtocol(self), local_addr=(self.ip, self.port), reuse_port=True, allow_broadcast=True
+        )
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def send(self, target: tuple[str, int], address: str, args: list | None = None):
+        self.transport.sendto(OSCSender.build_message(address, args).dgram, target)
+
+    def receive(self, data: bytes, addr: tuple[str, int]):
+        try:
+            messages = [timed.message for timed in OscPacket(data).messages]
+        except ParseError:
+            return
+
+        for message in messages:
+            if message.address == HEARTBEAT_ADDRESS and len(message.params) >= 5:
+                challenge, hostname, port, uptime, beats = message.params[:5]
+                self.__heartbeat(addr[0], port, challenge, hostname, uptime, beats)
+            elif message.address.endswith("/status/reply") and len(message.params) >= 2:
+                pending = self.__pending.get(message.params[0])
+                if pending is not None and not pending[0].done():
+                    pending[0].set_result((time.perf_counter() - pending[1], message.params[1]))
+
+    def __heartbeat(self, ip: str, port: int, challenge: str, hostname: str, uptime: float, beats: int):
+        key = (ip, port, challenge)
+        node = self.nodes.get(key)
+        if node is None:
+            if len(self.nodes) >= self.max_nodes:
+                del self.nodes[min(self.nodes.values(), key=lambda other: other.last_seen).key]
+            node = self.nodes[key] = Node(ip, port, challenge)
+        node.heartbeat(hostname, uptime, beats)
+
+    def prune(self):
+        cutoff = time.monotonic() - self.forget
+        for key in [key for key, node in self.nodes.items() if node.last_seen < cutoff]:
+            del self.nodes[key]
+
+    def select(self, target: str = "all") -> list[Node]:
+        # "all", a challenge such as "challenge/4", or a hostname
+        return [node for node in self.nodes.values() if target in ("all", node.challenge, node.hostname)]
+
+    async def query(self, node: Node):
+        async with self.__semaphore:
+            token = next(self.__tokens) % 2**31
+            future = asyncio.get_running_loop().create_future()
+            self.__pending[token] = (future, time.perf_counter())
+            try:
+                self.send((node.ip, node.port), f"/escaperoom/{node.challenge}/status", [token])
+                latency, reply = await asyncio.wait_for(future, self.timeout)
+                node.replied(latency, json.loads(reply))
+            except asyncio.TimeoutError:
+                node.timeouts += 1
+            finally:
+                self.__pending.pop(token, None)
+
+    async def query_all(self, nodes: list[Node] | None = None):
+        await asyncio.gather(*(self.query(node) for node in (self.select() if nodes is None else nodes)))
+
+    async def reset(self, nodes: list[Node]):
+        for node in nodes:
+            self.send((node.ip, node.port), f"/escaperoom/{node.challenge}/reset")
+        await asyncio.sleep(0.2)
+        await self.query_all(nodes)
+
+    def table(self) -> str:
+        now = time.monotonic()
+        lines = [f"{'node':<22} {'challenge':<12} {'host':<14} {'uptime':>8} {'seen':>6} {'lost':>5} {'rtt ms':>7} {'avg ms':>7} {'t/o':>4}  state"]
+        for node in sorted(self.nodes.values(), key=lambda node: node.key):
+            state = " ".join(f"{key}={value}" for key, value in node.state.items())
+            lines.append(
+                f"{node.ip + ':' + str(node.port):<22} {node.challenge:<12} {node.hostname[:14]:<14} {node.uptime:>7.0f}s {now - node.last_seen:>5.1f}s {node.missed:>5}"
+                f" {self.__ms(node.latency):>7} {self.__ms(node.latency_avg):>7} {node.timeouts:>4}  {state}"
+            )
+        lines.append(f"{len(self.nodes)} node(s), {len(self.__pending)} query(s) in flight")
+        return "\n".join(lines)
+
+    @staticmethod
+    def __ms(seconds: float | None) -> str:
+        return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def spawn_sim(count: int, monitor_port: int, heartbeat_interval: float = 1.0) -> list[subprocess.Popen]:
+    # Simulated handlers on this machine, alternating challenge 1 and 4, each with its own
+    # config file, receive port and state directory, all sending to the monitor
+    directory = tempfile.mkdtemp(prefix="escaperoom-fleet-")
+    here = os.path.dirname(os.path.abspath(__file__))
+    processes = []
+    for index in range(count):
+        module = ("challenge1", "challenge4")[index % 2]
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.bind(("127.0.0.1", 0))
+            rx_port = probe.getsockname()[1]
+
+        # one state file per node, not per challenge
+        state_dir = os.path.join(directory, str(index))
+        os.makedirs(state_dir)
+        path = os.path.join(directory, f"{module}-{index}.json")
+        with open(path, "w") as file:
+            json.dump({
+                "osc_rx_server_ip": "127.0.0.1", "osc_rx_server_port": rx_port,
+                "osc_tx_client_ip": "127.0.0.1", "osc_tx_client_port": monitor_port,
+                "state_dir": state_dir, "heartbeat_interval": heartbeat_interval,
+            }, file)
+
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(here, f"{module}.py"), path], cwd=here,
+            env={**os.environ, "ESCAPEROOM_BACKEND": "sim"}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+
+    def stop():
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    atexit.register(stop)
+    return processes
+
+
+async def main(args):
+    monitor = Monitor(args.ip, args.port, max_nodes=args.max_nodes, timeout=args.timeout, concurrency=args.concurrency, forget=args.forget)
+    await monitor.start()
+    if args.spawn_sim:
+        spawn_sim(args.spawn_sim, args.port)
+
+    # one heartbeat round before the first query, so the table is not empty
+    await asyncio.sleep(args.discover)
+    if args.reset:
+        await monitor.reset(monitor.select(args.reset))
+
+    live = sys.stdout.isatty() and not args.once
+    try:
+        while True:
+            monitor.prune()
+            await monitor.query_all()
+            print(("\x1b[H\x1b[J" if live else "") + monitor.table(), flush=True)
+            if args.once:
+                return
+            await asyncio.sleep(args.interval)
+    finally:
+        monitor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Discover, query and reset escape room handlers over OSC")
+    parser.add_argument("--ip", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=10000, help="the handlers' osc_tx_client_port, where heartbeats arrive")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between table refreshes")
+    parser.add_argument("--discover", type=float, default=2.5, help="seconds to listen for heartbeats before the first query")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds to wait for a status reply")
+    parser.add_argument("--concurrency", type=int, default=128, help="most status queries in flight at once")
+    parser.add_argument("--max-nodes", type=int, default=1024)
+    parser.add_argument("--forget", type=float, default=60, help="drop nodes silent for this many seconds")
+    parser.add_argument("--reset", metavar="TARGET", help="reset 'all', one challenge (e.g. challenge/4) or one hostname")
+    parser.add_argument("--once", action="store_true", help="print the table once and exit")
+    parser.add_argument("--spawn-sim", type=int, default=0, metavar="N", help="start N simulated handlers locally")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,285 @@
+from pythonosc import osc_message_builder, osc_bundle_builder
+import collections, logging, queue, random, socket, threading, time
+
+from runtime import ThreadedRuntime
+from metrics import REGISTRY
+from router import Router
+from realtime import REALTIME
+import journal
+
+
+class OSCSender():
+    # Long-lived sender: one broadcast socket and a bounded queue drained by a worker thread.
+    # Messages queued within `bundle_window` of each other go out as a single OSC bundle.
+    def __init__(self, tx_ip: str, tx_port: int, queue_size: int = 256, bundle_window: float = 0.002, max_bundle: int = 16):
+        self.tx_ip = tx_ip
+        self.tx_port = tx_port
+        self.bundle_window = bundle_window
+        self.max_bundle = max_bundle
+        self.dropped = REGISTRY.counter("osc_dropped_total")
+        self.latency = REGISTRY.histogram("osc_send_seconds")
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+        self.__queue:queue.Queue = queue.Queue(maxsize=queue_size)
+        self.__worker = threading.Thread(target=self.__run, name="OSCSender", daemon=True)
+        self.__worker.start()
+
+    def send(self, address: str, value=None, target: tuple[str, int] | None = None) -> bool:
+        try:
+            self.__queue.put_nowait((address, value, target or (self.tx_ip, self.tx_port), time.perf_counter()))
+            return True
+        except queue.Full:
+            self.dropped.inc()
+            return False
+
+    def flush(self):
+        self.__queue.join()
+
+    def close(self):
+        self.__queue.put((None, None, None, None))
+        self.__worker.join(timeout=1)
+        self.socket.close()
+
+    @staticmethod
+    def build_message(address: str, value):
+        builder = osc_message_builder.OscMessageBuilder(address=address)
+        if value is None:
+            values = []
+        elif isinstance(value, (list, tuple)):
+            values = value
+        else:
+            values = [value]
+        for arg in values:
+            builder.add_arg(arg)
+        return builder.build()
+
+    def __collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.bundle_window
+        while len(batch) < self.max_bundle:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.__queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def __run(self):
+        REALTIME.release()
+        while True:
+            batch = self.__collect(self.__queue.get())
+            closing = False
+
+            by_target:dict[tuple[str, int], list] = {}
+            queued:dict[tuple[str, int], list[float]] = {}
+            for address, value, target, enqueued in batch:
+                if address is None:
+                    closing = True
+                    continue
+                by_target.setdefault(target, []).append((address, value))
+                queued.setdefault(target, []).append(enqueued)
+
+            for target, messages in by_target.items():
+                try:
+                    logging.debug("OSC - Sending %s OSC message(s) to %s:%s - %s", len(messages), target[0], target[1], messages)
+                    if len(messages) == 1:
+                        dgram = self.build_message(*messages[0]).dgram
+                    else:
+                        bundle = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
+                        for address, value in messages:
+                            bundle.add_content(self.build_message(address, value))
+                        dgram = bundle.build().dgram
+                    self.socket.sendto(dgram, target)
+
+                    sent = time.perf_counter()
+                    for enqueued in queued[target]:
+                        self.latency.observe(sent - enqueued)
+                except Exception as e:
+                    logging.error("OSC - Failed to send OSC message(s) to %s:%s: %s", target[0], target[1], e)
+
+            for _ in batch:
+                self.__queue.task_done()
+
+            if closing:
+                return
+
+
+class ReliableLink():
+    # Acknowledged delivery over plain UDP. Reliable messages carry two trailing arguments,
+    # "seq" and a sequence number, and are sent again with exponential backoff until the
+    # receiver answers with /escaperoom/ack <address> <seq>. Incoming messages tagged the same
+    # way are acked back to the sender's IP on tx_port and applied only once, however many
+    # copies arrive; untagged messages are passed through as before.
+    ACK_ADDRESS = "/escaperoom/ack"
+
+    def __init__(self, sender: OSCSender, runtime, tx_port: int, initial_timeout: float = 0.1, max_timeout: float = 2.0,
+                 max_attempts: int = 10, dedup_size: int = 1024):
+        self.sender = sender
+        self.runtime = runtime
+        self.tx_port = tx_port
+        self.initial_timeout = initial_timeout
+        self.max_timeout = max_timeout
+        self.max_attempts = max_attempts
+        self.dedup_size = dedup_size
+
+        # random start, so a restarted process is not mistaken for a replay of the old one
+        self.__sequence = random.randrange(1, 2**30)
+        self.__pending:dict[int, list] = {} # seq -> [address, values, attempts, timeout, first sent]
+        self.__seen:collections.OrderedDict[tuple[str, int], None] = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+        self.retransmits = REGISTRY.counter("osc_retransmits_total")
+        self.undelivered = REGISTRY.counter("osc_undelivered_total")
+        self.duplicates = REGISTRY.counter("osc_duplicates_total")
+        self.ack_latency = REGISTRY.histogram("osc_ack_seconds")
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    @staticmethod
+    def values(value) -> list:
+        if value is None:
+            return []
+        return list(value) if isinstance(value, (list, tuple)) else [value]
+
+    def send(self, address: str, value=None) -> int:
+        with self.__lock:
+            sequence = self.__sequence
+            self.__sequence = self.__sequence + 1 if self.__sequence < 2**31 - 1 else 1
+            self.__pending[sequence] = [address, self.values(value) + ["seq", sequence], 1, self.initial_timeout, time.perf_counter()]
+            args = self.__pending[sequence][1]
+
+        self.sender.send(address, args)
+        self.runtime.call_later(self.initial_timeout, self.__retry, sequence)
+        return sequence
+
+    def __retry(self, sequence: int):
+        with self.__lock:
+            entry = self.__pending.get(sequence)
+            if entry is None:
+                return
+            address, args, attempts, timeout, _ = entry
+            if attempts >= self.max_attempts:
+                del self.__pending[sequence]
+                self.undelivered.inc()
+                logging.error("OSC - No ack for %s (seq %s) after %s attempts, giving up", address, sequence, attempts)
+                return
+            entry[2] = attempts + 1
+            entry[3] = timeout = min(timeout * 2, self.max_timeout)
+
+        logging.debug("OSC - Resending %s (seq %s), attempt %s", address, sequence, attempts + 1)
+        self.retransmits.inc()
+        self.sender.send(address, args)
+        self.runtime.call_later(timeout, self.__retry, sequence)
+
+    def on_ack(self, address: str, *args):
+        if len(args) < 2 or not isinstance(args[1], int):
+            logging.warning("OSC - Malformed ack: %s", args)
+            return
+        with self.__lock:
+            entry = self.__pending.get(args[1])
+            if entry is None or entry[0] != args[0]:
+                return
+            del self.__pending[args[1]]
+        self.ack_latency.observe(time.perf_counter() - entry[4])
+
+    def receive(self, handler, needs_reply_address: bool):
+        def received(client_address: tuple[str, int], address: str, *args):
+            if len(args) >= 2 and args[-2] == "seq" and isinstance(args[-1], int):
+                sequence, args = args[-1], args[:-2]
+                self.sender.send(self.ACK_ADDRESS, [address, sequence], target=(client_address[0], self.tx_port))
+
+                key = (client_address[0], sequence)
+                with self.__lock:
+                    duplicate = key in self.__seen
+                    self.__seen[key] = None
+                    self.__seen.move_to_end(key)
+                    if len(self.__seen) > self.dedup_size:
+                        self.__seen.popitem(last=False)
+                if duplicate:
+                    self.duplicates.inc()
+                    logging.debug("OSC - Ignoring duplicate %s (seq %s) from %s", address, sequence, client_address[0])
+                    return
+
+            if needs_reply_address:
+                return handler(client_address, address, *args)
+            return handler(address, *args)
+        return received
+
+
+class OSCController():
+    def __init__(self, rx_ip: str, rx_port: int, tx_ip: str, tx_port: int, runtime=None, reliable: bool = False):
+        logging.debug("OSC - Initializing OSC Controller...")
+        self.rx_ip = rx_ip
+        self.rx_port = rx_port
+        self.tx_ip = tx_ip
+        self.tx_port = tx_port
+        self.runtime = runtime or ThreadedRuntime()
+
+        self.dispatcher = Router()
+        self.server_active = False
+
+        # address -> name of the challenge that registered it, so a host running several
+        # challenges on one socket can refuse overlapping routes
+        self.routes:dict[str, str | None] = {}
+        self.owner:str | None = None
+
+        self.sender = OSCSender(self.tx_ip, self.tx_port)
+
+        self.link:ReliableLink | None = None
+        if reliable:
+            self.link = ReliableLink(self.sender, self.runtime, self.tx_port)
+            self.routes[ReliableLink.ACK_ADDRESS] = None
+            self.dispatcher.map(ReliableLink.ACK_ADDRESS, self.link.on_ack)
+
+    def add_handler(self, address: str, handler, needs_reply_address: bool = False):
+        if address in self.routes and self.routes[address] != self.owner:
+            raise ValueError(f"OSC address {address} is already routed to {self.routes[address]}")
+        self.routes[address] = self.owner
+        handler = self.journaled(handler, needs_reply_address)
+        if self.link is not None:
+            self.dispatcher.map(address, self.link.receive(handler, needs_reply_address), needs_reply_address=True)
+        else:
+            self.dispatcher.map(address, handler, needs_reply_address=needs_reply_address)
+
+    @staticmethod
+    def journaled(handler, needs_reply_address: bool):
+        if needs_reply_address:
+            def recorded(client_address, address: str, *args):
+                journal.record_osc(journal.OSC_IN, address, args)
+                return handler(client_address, address, *args)
+        else:
+            def recorded(address: str, *args):
+                journal.record_osc(journal.OSC_IN, address, args)
+                return handler(address, *args)
+        return recorded
+
+    def start_server(self):
+        logging.debug("OSC - Starting %s OSC server listening on %s:%s", self.runtime.mode, self.rx_ip, self.rx_port)
+
+        if self.server_active:
+            logging.debug("OSC - Server is already running, stopping it...")
+            self.stop_server()
+
+        self.server_active = True
+        try:
+            self.runtime.serve(self)
+        finally:
+            self.server_active = False
+
+    def stop_server(self):
+        self.runtime.stop()
+
+    def send_message(self, address: str, value, reliable: bool = False):
+        journal.record_osc(journal.OSC_OUT, address, ReliableLink.values(value))
+        # reliable only takes effect when the controller was created in reliable mode
+        if reliable and self.link is not None:
+            self.link.send(address, value)
+            return
+        if not self.sender.send(address, value):
+            logging.warning("OSC - Outbound queue full, dropped message %s: %s", address, value)
@@ -0,0 +1,111 @@
+from hardware import GPIO, BACKEND
+import contextlib, logging, mmap, os, struct, threading
+
+from metrics import REGISTRY
+
+
+class PinBank():
+    # Bank-level view of the GPIO header.
+    #
+    # Inputs: inside `with BANK.snapshot():` every level() is answered from one bulk read of the
+    # whole bank (bit n = BCM GPIO n), so evaluating all breakers or wires costs one read
+    # instead of one or two per pin. Without a bulk reader each pin is read at most once per
+    # snapshot. Snapshots are per thread; outside one, level() reads the pin directly.
+    #
+    # Outputs: a shadow register holds the last level written to each output, so writes of an
+    # unchanged level are skipped and output_level() never touches the hardware.
+    GPLEV0 = 0x34 # pin level register 0 (GPIO 0-31) in the BCM2835-BCM2711 GPIO block
+
+    def __init__(self):
+        self.__local = threading.local()
+        self.__shadow:int = 0
+        self.__lock = threading.Lock()
+        self.__gpiomem:mmap.mmap | None = None
+        self.read_bank = self.__find_reader()
+
+        self.reads = REGISTRY.counter("gpio_bank_reads_total")
+        self.skipped = REGISTRY.counter("gpio_output_skipped_total")
+
+    def __find_reader(self):
+        if hasattr(GPIO, "read_bank"): # simulated backend
+            return GPIO.read_bank
+
+        if BACKEND == "pi" and os.path.exists("/dev/gpiomem"):
+            try:
+                with open("/proc/device-tree/compatible", "rb") as compatible:
+                    if b"bcm2712" in compatible.read(): # Pi 5 GPIO lives on the RP1, not in this block
+                        return None
+                with open("/dev/gpiomem", "r+b") as gpiomem:
+                    self.__gpiomem = mmap.mmap(gpiomem.fileno(), 4096)
+                return self.__read_gpiomem
+            except OSError as e:
+                logging.warning("GPIO - Bank reads unavailable, falling back to per pin reads: %s", e)
+        return None
+
+    def __read_gpiomem(self) -> int:
+        return struct.unpack_from("<I", self.__gpiomem, self.GPLEV0)[0]
+
+    # inputs
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        outer = getattr(self.__local, "levels", None)
+        if self.read_bank is not None:
+            self.reads.inc()
+            self.__local.levels = self.read_bank()
+        else:
+            self.__local.levels = {}
+        try:
+            yield self.__local.levels
+        finally:
+            self.__local.levels = outer
+
+    def level(self, pin: int) -> bool:
+        levels = getattr(self.__local, "levels", None)
+        if isinstance(levels, int):
+            return bool(levels >> pin & 1)
+        if levels is None:
+            return GPIO.input(pin) == GPIO.HIGH
+        if pin not in levels:
+            levels[pin] = GPIO.input(pin) == GPIO.HIGH
+        return levels[pin]
+
+    # outputs
+
+    def setup_inputs(self, pins: list[int], pull_up_down: int | None = None):
+        if pins:
+            if pull_up_down is None:
+                GPIO.setup(pins, GPIO.IN)
+            else:
+                GPIO.setup(pins, GPIO.IN, pull_up_down=pull_up_down)
+
+    def setup_outputs(self, levels: dict[int, bool]):
+        # Every output in at most two setup calls, one per level, each pin driven straight to
+        # its level rather than passing through the driver's default
+        for level in (False, True):
+            pins = [pin for pin, initial in levels.items() if bool(initial) == level]
+            if pins:
+                GPIO.setup(pins, GPIO.OUT, initial=GPIO.HIGH if level else GPIO.LOW)
+        with self.__lock:
+            for pin, initial in levels.items():
+                self.__shadow = self.__shadow | 1 << pin if initial else self.__shadow & ~(1 << pin)
+
+    def setup_output(self, pin: int, initial: bool = False):
+        GPIO.setup(pin, GPIO.OUT, initial=GPIO.HIGH if initial else GPIO.LOW)
+        with self.__lock:
+            self.__shadow = self.__shadow | 1 << pin if initial else self.__shadow & ~(1 << pin)
+
+    def output(self, pin: int, level: bool):
+        bit = 1 << pin
+        with self.__lock:
+            if bool(self.__shadow & bit) == bool(level):
+                self.skipped.inc()
+                return
+            GPIO.output(pin, GPIO.HIGH if level else GPIO.LOW)
+            self.__shadow ^= bit
+
+    def output_level(self, pin: int) -> bool:
+        return bool(self.__shadow >> pin & 1)
+
+
+BANK = PinBank()
@@ -0,0 +1,124 @@
+import collections, logging, os, sys, threading, time
+
+from realtime import REALTIME
+
+# Wall-clock sampling profiler for a running handler. While it runs, a thread takes every
+# thread's stack from sys._current_frames() each `interval` seconds, so GPIO callbacks, the
+# keypad scanner, LED schedulers and the OSC server all show up, blocked or not. When it stops
+# the stacks are written in collapsed form, one "thread;outer;...;inner count" line each, which
+# flamegraph.pl, speedscope and inferno read directly:
+#
+#   flamegraph.pl /tmp/escaperoom-challenge4-20260101-120000.collapsed > profile.svg
+#
+# Nothing runs until it is started, so there is no cost while it is idle.
+
+
+class SamplingProfiler():
+    def __init__(self, name: str, directory: str | None = None, interval: float = 0.005, max_duration: float = 300, max_depth: int = 64):
+        self.name = name
+        self.directory = directory
+        self.interval = interval
+        self.max_duration = max_duration
+        self.max_depth = max_depth
+
+        self.__thread:threading.Thread | None = None
+        self.__stop = threading.Event()
+        self.__lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self, duration: float, done=None) -> bool:
+        # done(path, samples) is called from the profiler thread once the file is written
+        with self.__lock:
+            if self.running:
+                return False
+            self.__stop.clear()
+            self.__thread = threading.Thread(target=self.__run, args=(min(duration, self.max_duration), done), name="Profiler", daemon=True)
+            self.__thread.start()
+        return True
+
+    def stop(self):
+        self.__stop.set()
+
+    def __run(self, duration: float, done):
+        REALTIME.release()
+        logging.info("PROFILE - Sampling all threads every %sms for %ss", self.interval * 1000, duration)
+        stacks:collections.Counter[tuple[str, ...]] = collections.Counter()
+        labels:dict = {}  # code object -> frame label
+        names:dict[int, str] = {}
+        me = threading.get_ident()
+        samples = 0
+        busy = 0.0
+
+        started = time.monotonic()
+        deadline = started + duration
+        while not self.__stop.wait(self.interval) and time.monotonic() < deadline:
+            begin = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names.update((thread.ident, thread.name) for thread in threading.enumerate())
+
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)).replace(";", ":"))
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            busy += time.perf_counter() - begin
+
+        elapsed = time.monotonic() - started
+        path = self.write(stacks)
+        logging.info("PROFILE - %s samples over %.1fs written to %s, sampling used %.2f%% of one core",
+                     samples, elapsed, path, busy / elapsed * 100 if elapsed else 0)
+        if done is not None:
+            done(path, samples)
+
+    def write(self, stacks: collections.Counter) -> str:
+        if self.directory is None:
+            import tempfile
+            self.directory = tempfile.gettempdir()
+        path = os.path.join(self.directory, f"escaperoom-{self.name.replace('/', '-')}-{time.strftime('%Y%m%d-%H%M%S')}.collapsed")
+        try:
+            with open(path, "w") as file:
+                for stack, count in stacks.most_common():
+                    file.write(f"{';'.join(stack)} {count}\n")
+        except OSError as e:
+            logging.error("PROFILE - Failed to write %s: %s", path, e)
+        return path
+
+
+def serve_profiler(osc_controller, challenge: str, config: dict):
+    # /escaperoom/<challenge>/profile/start [seconds]  samples every thread for that long (default 10)
+    # /escaperoom/<challenge>/profile/stop             stops early and writes what it has
+    # When the file is written, /escaperoom/<challenge>/profile/written <path> <samples> is sent
+    # back to whoever started it. profile_dir and profile_interval are read from `config` at each
+    # start, so a config reload applies to the next run.
+    prefix = f"/escaperoom/{challenge}/profile"
+    profiler = SamplingProfiler(challenge)
+
+    def start(client_address, address: str, *args):
+        seconds = float(args[0]) if args and isinstance(args[0], (int, float)) and args[0] > 0 else 10.0
+
+        def done(path: str, samples: int):
+            osc_controller.sender.send(f"{prefix}/written", [path, samples], target=client_address)
+
+        profiler.directory = config["profile_dir"]
+        profiler.interval = config["profile_interval"]
+        if not profiler.start(seconds, done):
+            logging.warning("PROFILE - Already running, ignoring start from %s", client_address[0])
+
+    def stop(address: str, *args):
+        profiler.stop()
+
+    osc_controller.add_handler(f"{prefix}/start", start, needs_reply_address=True)
+    osc_controller.add_handler(f"{prefix}/stop", stop)
+    return profiler
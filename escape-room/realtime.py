@@ -0,0 +1,203 @@
+import gc, logging, os, threading, time
+
+from metrics import REGISTRY
+
+# Opt-in real-time mode ("realtime": true in a challenge config). The threads on the path from a
+# GPIO edge to an action - the edge callback thread, the runtime's timer thread or event loop,
+# the OSC server and the matrix keypad scanner - move themselves to SCHED_FIFO and onto the
+# configured cores when they first run with the mode on. Nothing else is promoted: threads
+# they start get the normal scheduler back (SCHED_RESET_ON_FORK), and the other workers (LED
+# flashing, OSC sending, the LCD, the profiler) call release() to leave the pinned cores. The
+# process also:
+#
+#   - locks its memory with mlockall(MCL_CURRENT | MCL_FUTURE), so nothing is paged out
+#   - stops glibc returning freed heap to the kernel and pre-faults `prefault_mb` of it, so
+#     allocations on the hot path reuse resident pages instead of page faulting
+#   - collects and freezes everything allocated while the handlers are built (freeze()), so the
+#     collector never walks it
+#
+# Each step that lacks privileges (CAP_SYS_NICE, RLIMIT_MEMLOCK) is logged and skipped; the
+# handler keeps running as a normal process. Once enabled, wakeup jitter is measured from a
+# promoted thread and logged, and kept in the realtime_wakeup_jitter_seconds histogram.
+#
+#   sudo python realtime.py --seconds 5    compares wakeup jitter with and without the mode
+
+MCL_CURRENT, MCL_FUTURE = 1, 2
+M_TRIM_THRESHOLD, M_MMAP_MAX = -1, -4 # glibc mallopt parameters
+JITTER_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+
+
+class Realtime():
+    def __init__(self):
+        self.enabled:bool = False
+        self.priority:int = 50
+        self.cpus:set[int] | None = None
+        self.all_cpus:set[int] | None = None
+
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__fifo_denied:bool = False
+        self.__libc = None
+
+        self.jitter = REGISTRY.histogram("realtime_wakeup_jitter_seconds", bounds=JITTER_BUCKETS)
+        self.promoted = REGISTRY.counter("realtime_threads_promoted_total")
+
+    def enable(self, priority: int = 50, cpus: list[int] | None = None, prefault_mb: int = 8, probe: float = 1.0):
+        # Idempotent, like open_journal: challenges sharing a process share one mode
+        with self.__lock:
+            if self.enabled:
+                return
+            self.priority = priority
+            self.cpus = set(cpus) if cpus else self.default_cpus()
+            try:
+                self.all_cpus = os.sched_getaffinity(0)
+            except (AttributeError, OSError):
+                self.all_cpus = None
+            logging.info("REALTIME - Enabling SCHED_FIFO priority %s on CPUs %s", priority, sorted(self.cpus) if self.cpus else "any")
+
+            self.__libc = self.__load_libc()
+            self.__lock_memory(prefault_mb)
+            self.enabled = True
+
+        if probe > 0:
+            threading.Thread(target=self.__probe_and_log, args=(probe,), name="RealtimeProbe", daemon=True).start()
+
+    def freeze(self):
+        # Called once the handlers are built, so their long-lived objects are the ones frozen
+        if self.enabled:
+            gc.collect()
+            gc.freeze()
+
+    @staticmethod
+    def default_cpus() -> set[int] | None:
+        # the highest core the process may use, leaving the others to the OS and everything else
+        try:
+            available = os.sched_getaffinity(0)
+        except (AttributeError, OSError):
+            return None
+        return {max(available)} if len(available) > 1 else None
+
+    @staticmethod
+    def __load_libc():
+        import ctypes, ctypes.util # only paid once the mode is turned on
+        name = ctypes.util.find_library("c")
+        if name is None:
+            return None
+        try:
+            return ctypes.CDLL(name, use_errno=True)
+        except OSError:
+            return None
+
+    def __lock_memory(self, prefault_mb: int):
+        if self.__libc is None or not hasattr(self.__libc, "mlockall"):
+            logging.warning("REALTIME - No libc mlockall on this platform, memory is not locked")
+            return
+
+        if hasattr(self.__libc, "mallopt"):
+            self.__libc.mallopt(M_TRIM_THRESHOLD, -1) # never give freed heap back
+            self.__libc.mallopt(M_MMAP_MAX, 0)        # serve large blocks from the heap too
+
+        import ctypes
+        if self.__libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            errno = ctypes.get_errno()
+            logging.warning("REALTIME - mlockall failed (%s), memory is not locked; raise RLIMIT_MEMLOCK or run with CAP_IPC_LOCK", os.strerror(errno))
+            return
+
+        if prefault_mb > 0 and hasattr(self.__libc, "malloc"):
+            self.__libc.malloc.restype = ctypes.c_void_p
+            self.__libc.free.argtypes = [ctypes.c_void_p]
+            size = prefault_mb * 1024 * 1024
+            block = self.__libc.malloc(size)
+            if block:
+                ctypes.memset(block, 0, size) # touch every page so it is faulted in and locked
+                self.__libc.free(block)
+        logging.info("REALTIME - Memory locked, %sMB of heap pre-faulted", prefault_mb)
+
+    def promote(self, role: str):
+        # Called from inside a hot thread; costs one attribute check when the mode is off
+        if not self.enabled or getattr(self.__local, "role", None) is not None:
+            return
+        self.__local.role = role
+
+        if self.cpus:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except (AttributeError, OSError) as e:
+                logging.warning("REALTIME - Could not pin %s thread to CPUs %s: %s", role, sorted(self.cpus), e)
+
+        if self.__fifo_denied:
+            return
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO | getattr(os, "SCHED_RESET_ON_FORK", 0), os.sched_param(self.priority))
+        except AttributeError:
+            self.__fifo_denied = True
+            logging.warning("REALTIME - SCHED_FIFO is not available on this platform, threads keep the normal scheduler")
+            return
+        except PermissionError:
+            self.__fifo_denied = True
+            logging.warning("REALTIME - Not permitted to use SCHED_FIFO, threads keep the normal scheduler; run as root or grant CAP_SYS_NICE")
+            return
+        except OSError as e:
+            logging.warning("REALTIME - Could not move %s thread to SCHED_FIFO: %s", role, e)
+            return
+
+        self.promoted.inc()
+        logging.debug("REALTIME - %s thread %s on SCHED_FIFO %s", role, threading.get_native_id(), self.priority)
+
+    def release(self):
+        # Called at the top of worker threads that are not on the hot path. One started by a
+        # promoted thread inherits its cores (though not SCHED_FIFO), so it goes back to all of them.
+        if not self.enabled or self.all_cpus is None or self.all_cpus == self.cpus:
+            return
+        try:
+            os.sched_setaffinity(0, self.all_cpus)
+        except (AttributeError, OSError):
+            pass
+
+    def probe(self, seconds: float = 1.0, period: float = 0.001) -> dict:
+        # Sleeps to a fixed 1ms grid and measures how late each wakeup is
+        late = []
+        deadline = time.monotonic() + period
+        end = time.monotonic() + seconds
+        while deadline < end:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            lateness = time.monotonic() - deadline
+            late.append(lateness)
+            self.jitter.observe(lateness)
+            deadline += period
+        late.sort()
+        if not late:
+            return {"samples": 0}
+        return {
+            "samples": len(late),
+            "p50_us": round(late[len(late) // 2] * 1e6, 1),
+            "p99_us": round(late[min(len(late) - 1, int(len(late) * 0.99))] * 1e6, 1),
+            "max_us": round(late[-1] * 1e6, 1),
+        }
+
+    def __probe_and_log(self, seconds: float):
+        self.promote("probe")
+        result = self.probe(seconds)
+        logging.info("REALTIME - Wakeup jitter over %ss: p50 %sus, p99 %sus, max %sus",
+                     seconds, result.get("p50_us"), result.get("p99_us"), result.get("max_us"))
+
+
+REALTIME = Realtime()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure wakeup jitter with and without the real-time mode")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--priority", type=int, default=50)
+    parser.add_argument("--cpus", type=int, nargs="+")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+    print("normal  ", REALTIME.probe(args.seconds))
+    REALTIME.enable(args.priority, args.cpus, probe=0)
+    measured = {}
+    thread = threading.Thread(target=lambda: (REALTIME.promote("probe"), measured.update(REALTIME.probe(args.seconds))))
+    thread.start()
+    thread.join()
+    print("realtime", measured)
@@ -0,0 +1,139 @@
+import argparse, difflib, importlib, json, os, socket, sys, tempfile, time
+
+# Feeds a journal recorded by a challenge (see journal.py) back into a fresh handler on the
+# simulated backend, at the original pace or faster, and diffs the OSC it sends against what
+# was sent during the recorded game.
+#
+#   python replay.py /var/log/escaperoom/challenge4.journal challenge4 --speed 10 --config challenge4.toml
+#
+# Debounce settle windows are divided by the speed along with the gaps between inputs, so a
+# faster replay sees the same edges as the recorded game. Once they shrink below the
+# scheduling jitter of the machine edges can still collapse, and outputs can legitimately
+# differ; that is the point of a stress run rather than a reproduction.
+# The replay starts from a fresh state, so a session that began by restoring a snapshot will
+# not reproduce either.
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def sessions(records: list[tuple[int, int, int, int]]) -> list[list[tuple[int, int, int, int]]]:
+    import journal
+
+    found:list[list] = []
+    for entry in records:
+        if entry[1] == journal.SESSION or not found:
+            found.append([])
+        found[-1].append(entry)
+    return found
+
+
+def outputs(strings: list[str], session: list[tuple[int, int, int, int]]) -> list[tuple[int, str]]:
+    import journal
+
+    sent = []
+    for timestamp, kind, ident, value in session:
+        if kind == journal.OSC_OUT:
+            address = strings[ident] if ident < len(strings) else "?"
+            sent.append((timestamp, address if value == journal.NO_VALUE else f"{address} {value}"))
+    return sent
+
+
+def scale_settle(config: dict, speed: float):
+    config["debounce"] = {role: settle / speed for role, settle in config["debounce"].items()}
+    for entries in config.values(): # per-pin overrides, e.g. defuse_wires or circuit_breakers
+        if isinstance(entries, list):
+            for entry in entries:
+                if isinstance(entry, dict) and "settle" in entry:
+                    entry["settle"] /= speed
+
+
+def replay(path: str, challenge: str, speed: float = 1.0, session_index: int = -1, output: str | None = None, settle: float = 1.0,
+           config_file: str | None = None) -> bool:
+    os.environ["ESCAPEROOM_BACKEND"] = "sim"
+    import journal
+    from hardware import GPIO
+    from osc import OSCSender
+
+    strings, records = journal.read_journal(path)
+    session = sessions(records)[session_index]
+
+    inputs = [entry for entry in session if entry[1] in (journal.EDGE, journal.LEVEL, journal.KEY, journal.OSC_IN)]
+    initial = 0
+    while initial < len(inputs) and inputs[initial][1] == journal.LEVEL:
+        initial += 1
+    print(f"Replaying {len(inputs) - initial} inputs from {path} into {challenge} at {speed}x")
+
+    output = output or os.path.join(tempfile.mkdtemp(prefix="escaperoom-replay-"), f"{challenge}.journal")
+    if os.path.exists(output):
+        os.remove(output)
+
+    # the recorded game's config file, if given, over the challenge defaults
+    module = importlib.import_module(challenge)
+    config = module.load(config_file)
+    config.update(
+        osc_rx_server_ip="127.0.0.1", osc_rx_server_port=free_port(),
+        osc_tx_client_ip="127.0.0.1", osc_tx_client_port=free_port(), osc_reliable=False,
+        state_dir=os.path.dirname(output), journal_path=output,
+    )
+    if "keypad_driver" in config:
+        config["keypad_driver"] = "pad4pi" # the journal holds debounced keys, not matrix scans
+    scale_settle(config, speed)
+
+    # handed to the handler as its own file, so a config named in the environment cannot override it
+    config_file = os.path.join(os.path.dirname(output), f"{challenge}.json")
+    with open(config_file, "w") as file:
+        json.dump(config, file, indent=2)
+
+    # the pins start where they were when the recorded handler began watching them
+    for _, _, pin, level in inputs[:initial]:
+        GPIO.inject(pin, level)
+    handler = module.Handler(config_file=config_file)
+
+    inputs = inputs[initial:]
+    if inputs:
+        origin, started = inputs[0][0], time.monotonic()
+        for timestamp, kind, ident, value in inputs:
+            delay = started + (timestamp - origin) / 1e9 / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            if kind in (journal.EDGE, journal.LEVEL):
+                GPIO.inject(ident, value)
+            elif kind == journal.KEY:
+                handler.keypad_keypad.press(chr(ident))
+            elif kind == journal.OSC_IN and ident < len(strings):
+                args = [] if value == journal.NO_VALUE else [value]
+                dgram = OSCSender.build_message(strings[ident], args).dgram
+                handler.osc_controller.dispatcher.call_handlers_for_packet(dgram, ("127.0.0.1", 0))
+    time.sleep(settle)
+
+    replay_strings, replay_records = journal.read_journal(output)
+    expected = outputs(strings, session)
+    actual = outputs(replay_strings, sessions(replay_records)[-1])
+
+    diff = list(difflib.unified_diff([line for _, line in expected], [line for _, line in actual], "recorded", "replayed", lineterm=""))
+    if diff:
+        print("\n".join(diff))
+    else:
+        for (recorded_at, line), (replayed_at, _) in zip(expected, actual):
+            print(f"  {line:<48} recorded +{(recorded_at - expected[0][0]) / 1e6:9.1f}ms  replayed +{(replayed_at - actual[0][0]) / 1e6 * speed:9.1f}ms (scaled)")
+    print(f"{len(expected)} recorded outputs, {len(actual)} replayed, {'identical' if not diff else 'DIFFERENT'}")
+    return not diff
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded challenge journal and diff the OSC outputs")
+    parser.add_argument("journal")
+    parser.add_argument("challenge", help="challenge module, e.g. challenge4")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 for real time, 100 to compress a game into seconds")
+    parser.add_argument("--session", type=int, default=-1, help="which session in the file, -1 for the last")
+    parser.add_argument("--output", help="where to write the replay's own journal")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait for outputs after the last input")
+    parser.add_argument("--config", help="the config file the recorded game ran with, if it had one")
+    args = parser.parse_args()
+
+    sys.exit(0 if replay(args.journal, args.challenge, args.speed, args.session, args.output, args.settle, args.config) else 1)
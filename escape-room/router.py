@@ -0,0 +1,198 @@
+from pythonosc.osc_packet import OscPacket, ParseError
+import re, struct, time
+
+from metrics import REGISTRY
+
+PATTERN = re.compile(rb"[*?\[{]") # an incoming OSC address pattern rather than a plain address
+
+
+class Route():
+    # One mapped handler. invoke() mirrors pythonosc.dispatcher.Handler.invoke (python-osc 1.10),
+    # so handlers written for the stock dispatcher get the same arguments
+    __slots__ = ("callback", "args", "needs_reply_address")
+
+    def __init__(self, callback, args: list, needs_reply_address: bool = False):
+        self.callback = callback
+        self.args = args
+        self.needs_reply_address = needs_reply_address
+
+    def __eq__(self, other):
+        return isinstance(other, Route) and (self.callback, self.args, self.needs_reply_address) == (other.callback, other.args, other.needs_reply_address)
+
+    def invoke(self, client_address: tuple[str, int], message):
+        prefix = (client_address, message.address) if self.needs_reply_address else (message.address,)
+        if self.args:
+            return self.callback(*prefix, self.args, *message)
+        return self.callback(*prefix, *message)
+
+
+class Router():
+    # Drop-in replacement for the python-osc Dispatcher that routes with one dict lookup.
+    #
+    # The stock dispatcher decodes every packet in full, then turns each address into a regex
+    # and tries it against every mapped address. Here the mapped addresses are compiled into an
+    # address -> handlers table whenever the mapping changes, and the addresses are read straight
+    # out of the datagram before anything is decoded, so a packet no handler wants is dropped
+    # without parsing its arguments - the show network carries every other room's OSC as well.
+    #
+    # Mapped addresses containing "*" and incoming address patterns still work, through slower
+    # regex matching, and a default handler turns the early drop off. Not subclassing the stock
+    # dispatcher also keeps its asyncio import out of the threaded runtime's cold start.
+    #
+    # call_handlers_for_packet mirrors pythonosc.dispatcher.Dispatcher.call_handlers_for_packet
+    # (python-osc 1.10): bundle time tags are slept on with strict_timing, handler return values
+    # are collected for the server to send back, and a packet that fails to parse is ignored.
+    # requirements.txt keeps python-osc on 1.x; check these against upstream when moving past it.
+    MAX_DEPTH = 8 # nested bundles
+
+    def __init__(self, strict_timing: bool = True):
+        self.strict_timing = strict_timing
+        self.__map:dict[str, list[Route]] = {}
+        self.__default:Route | None = None
+        self.__exact:dict[str, list[Route]] = {}
+        self.__wanted:frozenset[bytes] = frozenset()
+        self.__wildcards:list[tuple[re.Pattern, list[Route]]] = []
+
+        self.routed = REGISTRY.counter("osc_routed_total")
+        self.unrouted = REGISTRY.counter("osc_unrouted_total")
+
+    def map(self, address: str, handler, *args, needs_reply_address: bool = False) -> Route:
+        route = Route(handler, list(args), needs_reply_address)
+        self.__map.setdefault(address, []).append(route)
+        self.__compile()
+        return route
+
+    def unmap(self, address: str, handler, *args, needs_reply_address: bool = False):
+        route = handler if isinstance(handler, Route) else Route(handler, list(args), needs_reply_address)
+        try:
+            self.__map.get(address, []).remove(route)
+        except ValueError:
+            raise ValueError(f"Address '{address}' doesn't have handler '{handler}' mapped to it") from None
+        self.__compile()
+
+    def set_default_handler(self, handler, needs_reply_address: bool = False):
+        self.__default = None if handler is None else Route(handler, [], needs_reply_address)
+
+    def __compile(self):
+        # mapped "*" addresses match the way python-osc matches them
+        wildcards = [(re.compile(address.replace("*", ".*?") + "$"), list(routes)) for address, routes in self.__map.items() if routes and "*" in address]
+        exact = {}
+        for address, routes in self.__map.items():
+            if routes and "*" not in address:
+                exact[address] = list(routes) + [route for pattern, more in wildcards if pattern.match(address) for route in more]
+        self.__exact, self.__wildcards = exact, wildcards
+        self.__wanted = frozenset(address.encode() for address in exact)
+
+    @staticmethod
+    def pattern_to_regex(address_pattern: str) -> re.Pattern | None:
+        # OSC 1.0 address pattern syntax: * ? [abc] [!abc] [a-z] {foo,bar}
+        regex, index = "^", 0
+        while index < len(address_pattern):
+            char = address_pattern[index]
+            if char == "*":
+                regex += "[^/]*"
+            elif char == "?":
+                regex += "[^/]"
+            elif char == "[":
+                end = address_pattern.find("]", index)
+                if end < 0:
+                    return None
+                body = address_pattern[index + 1:end]
+                negate = body.startswith("!")
+                body = re.sub(r"([\\\^\[\]])", r"\\\1", body[1:] if negate else body)
+                regex += f"[{'^' if negate else ''}{body}]"
+                index = end
+            elif char == "{":
+                end = address_pattern.find("}", index)
+                if end < 0:
+                    return None
+                regex += "(" + "|".join(re.escape(option) for option in address_pattern[index + 1:end].split(",")) + ")"
+                index = end
+            else:
+                regex += re.escape(char)
+            index += 1
+        try:
+            return re.compile(regex + "$")
+        except re.error:
+            return None
+
+    def handlers_for_address(self, address_pattern: str) -> list[Route]:
+        routes = self.__exact.get(address_pattern)
+        if routes is not None:
+            return routes
+
+        if PATTERN.search(address_pattern.encode()):
+            pattern = self.pattern_to_regex(address_pattern)
+            routes = [] if pattern is None else [
+                route for address, mapped in self.__map.items() if pattern.match(address) for route in mapped
+            ]
+        else:
+            routes = [route for pattern, mapped in self.__wildcards if pattern.match(address_pattern) for route in mapped]
+
+        if not routes and self.__default is not None:
+            return [self.__default]
+        return routes
+
+    @classmethod
+    def addresses(cls, data: bytes, depth: int = 0) -> list[bytes] | None:
+        # The address of every message in the datagram, without decoding any arguments;
+        # None when it is not valid OSC
+        if data[:8] == b"#bundle\0":
+            if depth >= cls.MAX_DEPTH:
+                return None
+            found = []
+            index = 16 # tag and time tag
+            while index < len(data):
+                if index + 4 > len(data):
+                    return None
+                size = struct.unpack_from(">i", data, index)[0]
+                index += 4
+                if size <= 0 or index + size > len(data):
+                    return None
+                inner = cls.addresses(data[index:index + size], depth + 1)
+                if inner is None:
+                    return None
+                found.extend(inner)
+                index += size
+            return found
+
+        end = data.find(b"\0")
+        if end < 1 or data[:1] != b"/":
+            return None
+        return [data[:end]]
+
+    def wants(self, data: bytes) -> bool:
+        if self.__default is not None:
+            return True
+        addresses = self.addresses(data)
+        if not addresses:
+            return False
+        for address in addresses:
+            if address in self.__wanted:
+                return True
+            if (self.__wildcards or PATTERN.search(address)) and self.handlers_for_address(address.decode(errors="replace")):
+                return True
+        return False
+
+    def call_handlers_for_packet(self, data: bytes, client_address: tuple[str, int]) -> list:
+        if not self.wants(data):
+            self.unrouted.inc()
+            return []
+        self.routed.inc()
+
+        results = []
+        try:
+            for timed in OscPacket(data).messages:
+                routes = self.handlers_for_address(timed.message.address)
+                if not routes:
+                    continue
+                now = time.time()
+                if self.strict_timing and timed.time > now: # a bundle scheduled for later
+                    time.sleep(timed.time - now)
+                for route in routes:
+                    result = route.invoke(client_address, timed.message)
+                    if result is not None:
+                        results.append(result)
+        except ParseError:
+            pass
+        return results
@@ -0,0 +1,170 @@
+from pythonosc.osc_message_builder import build_msg
+import heapq, itertools, logging, signal, socketserver, threading, time
+
+from realtime import REALTIME
+
+# pythonosc.osc_server and asyncio are imported only by the asyncio runtime: together they are
+# most of a cold start on a Pi Zero, and the threaded runtime needs neither.
+
+
+class Timer():
+    def __init__(self, callback, args: tuple):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        if not self.cancelled:
+            self.callback(*self.args)
+
+
+class OSCRequestHandler(socketserver.BaseRequestHandler):
+    # Mirrors pythonosc.osc_server._UDPHandler.handle (python-osc 1.10): every value a handler
+    # returns is sent back to the client as an OSC message, a bare address or (address, *args)
+    def handle(self):
+        data, sock = self.request
+        for result in self.server.dispatcher.call_handlers_for_packet(data, self.client_address):
+            if not isinstance(result, tuple):
+                result = (result,)
+            sock.sendto(build_msg(result[0], result[1:]).dgram, self.client_address)
+
+
+class OSCUDPServer(socketserver.UDPServer):
+    def __init__(self, address: tuple[str, int], dispatcher):
+        self.dispatcher = dispatcher
+        super().__init__(address, OSCRequestHandler)
+
+
+class ThreadedRuntime():
+    # The original model: callbacks run on whichever thread raised them (GPIO edge thread,
+    # pad4pi thread, OSC server thread). Timers share one thread instead of one thread each.
+    mode = "threaded"
+
+    def __init__(self):
+        self.server = None
+
+        self.__timers:list[tuple[float, int, Timer]] = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+        self.__timer_thread = None
+
+    def post(self, callback, *args):
+        callback(*args)
+
+    def bridge(self, callback):
+        return callback
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        timer = Timer(callback, args)
+        with self.__condition:
+            if self.__timer_thread is None:
+                self.__timer_thread = threading.Thread(target=self.__run_timers, name="RuntimeTimers", daemon=True)
+                self.__timer_thread.start()
+
+            heapq.heappush(self.__timers, (time.monotonic() + delay, next(self.__sequence), timer))
+            self.__condition.notify()
+        return timer
+
+    def __run_timers(self):
+        while True:
+            with self.__condition:
+                while not self.__timers or self.__timers[0][0] > time.monotonic():
+                    self.__condition.wait(self.__timers[0][0] - time.monotonic() if self.__timers else None)
+                _, _, timer = heapq.heappop(self.__timers)
+
+            REALTIME.promote("timers")
+
+            try:
+                timer.fire()
+            except Exception as e:
+                logging.error("RUNTIME - Timer callback %s failed: %s", timer.callback, e)
+
+    def serve(self, osc_controller):
+        self.server = OSCUDPServer((osc_controller.rx_ip, osc_controller.rx_port), osc_controller.dispatcher)
+        REALTIME.promote("osc")
+        self.server.serve_forever()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class AsyncioRuntime():
+    # All puzzle logic runs on a single event loop thread. GPIO and keypad callbacks are
+    # bridged in with call_soon_threadsafe, and OSC is served by AsyncIOOSCUDPServer on the
+    # same loop, so handler state is only ever touched from one thread.
+    mode = "asyncio"
+
+    def __init__(self):
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+        self.transport = None
+
+    def post(self, callback, *args):
+        self.loop.call_soon_threadsafe(self.__invoke, callback, args)
+
+    def bridge(self, callback):
+        def bridged(*args):
+            self.loop.call_soon_threadsafe(self.__invoke, callback, args)
+        return bridged
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        timer = Timer(callback, args)
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, self.__invoke, timer.fire, ())
+        return timer
+
+    @staticmethod
+    def __invoke(callback, args: tuple):
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.error("RUNTIME - Callback %s failed: %s", callback, e)
+
+    def serve(self, osc_controller):
+        import asyncio
+        from pythonosc import osc_server
+        asyncio.set_event_loop(self.loop)
+        REALTIME.promote("loop")
+        server = osc_server.AsyncIOOSCUDPServer((osc_controller.rx_ip, osc_controller.rx_port), osc_controller.dispatcher, self.loop)
+        self.transport, _ = self.loop.run_until_complete(server.create_serve_endpoint())
+        try:
+            self.loop.run_forever()
+        finally:
+            self.transport.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+RUNTIMES = {
+    ThreadedRuntime.mode: ThreadedRuntime,
+    AsyncioRuntime.mode: AsyncioRuntime,
+}
+
+
+def post_on_signal(runtime, signum: int, callback):
+    # The signal handler only sets an event. Python runs handlers on the main thread between
+    # bytecodes, where it may be holding a lock the callback needs (the pin bank, the snapshot),
+    # so a waiting thread posts the callback to the runtime instead of running it in the handler
+    pending = threading.Event()
+
+    def wait():
+        while True:
+            pending.wait()
+            pending.clear()
+            try:
+                runtime.post(callback)
+            except Exception as e:
+                logging.error("RUNTIME - Signal callback %s failed: %s", callback, e)
+
+    threading.Thread(target=wait, name=signal.Signals(signum).name, daemon=True).start()
+    signal.signal(signum, lambda *a: pending.set())
+
+
+def create_runtime(mode: str = "threaded"):
+    if mode not in RUNTIMES:
+        raise ValueError(f"Unknown runtime mode: {mode}, expected one of {list(RUNTIMES)}")
+    return RUNTIMES[mode]()
@@ -0,0 +1,477 @@
+import collections, logging, queue, random, socket, threading, time
+
+
+class SimPin():
+    def __init__(self, number: int):
+        self.number = number
+        self.direction:int | None = None
+        self.pull:int | None = None
+        self.level:int = 0
+        self.driven:int | None = None # level forced by inject(), otherwise the pull decides
+        self.edge:int | None = None
+        self.callbacks:list = []
+        self.bouncetime:float = 0
+        self.last_event:float = float("-inf")
+
+
+class SimMatrix():
+    # Switch matrix between row and column pins without diodes. A column reads LOW when a
+    # pressed key connects it to a row driven LOW, directly or through a chain of other pressed
+    # keys, which is how ghost keys show up on the real hardware.
+    def __init__(self, gpio: "SimGPIO", keys: list[list[str]], row_pins: list[int], col_pins: list[int]):
+        self.gpio = gpio
+        self.keys = keys
+        self.row_pins = row_pins
+        self.col_pins = col_pins
+        self.positions:dict[str, tuple[int, int]] = {key: (r, c) for r, row in enumerate(keys) for c, key in enumerate(row)}
+        self.pressed:set[tuple[int, int]] = set()
+        self.press_log:collections.deque = collections.deque(maxlen=10_000)
+
+    def press(self, key: str):
+        self.__set(key, True)
+
+    def release(self, key: str):
+        self.__set(key, False)
+
+    def tap(self, key: str, hold: float = 0.05):
+        self.press(key)
+        time.sleep(hold)
+        self.release(key)
+
+    def type(self, keys: str, hold: float = 0.05, gap: float = 0.05):
+        for key in keys:
+            self.tap(key, hold)
+            time.sleep(gap)
+
+    def __set(self, key: str, down: bool):
+        if key not in self.positions:
+            raise ValueError(f"Key {key!r} is not on the keypad")
+        self.press_log.append((time.monotonic_ns(), key, down))
+        if down:
+            self.pressed.add(self.positions[key])
+        else:
+            self.pressed.discard(self.positions[key])
+        self.gpio.refresh_matrix(self)
+
+    def column_levels(self, row_levels: list[int | None]) -> list[int]:
+        # row_levels[r] is the level row r is driving, or None if it is not an output
+        low = {("row", r) for r, level in enumerate(row_levels) if level == 0}
+        reached = set(low)
+        frontier = list(low)
+        while frontier:
+            kind, index = frontier.pop()
+            for r, c in self.pressed:
+                if kind == "row" and r == index and ("col", c) not in reached:
+                    reached.add(("col", c))
+                    frontier.append(("col", c))
+                elif kind == "col" and c == index and ("row", r) not in reached:
+                    reached.add(("row", r))
+                    frontier.append(("row", r))
+        return [0 if ("col", c) in reached else None for c in range(len(self.col_pins))]
+
+
+class SimGPIO():
+    # Drop-in stand-in for the RPi.GPIO module. Inputs are driven with inject()/play()/storm(),
+    # edge callbacks run on one event thread like the real driver, and every output change is
+    # recorded with a monotonic_ns timestamp in `output_log`.
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, log_size: int = 100_000):
+        self.mode:int | None = None
+        self.pins:dict[int, SimPin] = {}
+        self.output_log:collections.deque = collections.deque(maxlen=log_size)
+        self.edge_log:collections.deque = collections.deque(maxlen=log_size)
+        self.matrices:list[SimMatrix] = []
+
+        self.__lock = threading.RLock()
+        self.__events:queue.SimpleQueue = queue.SimpleQueue()
+        self.__event_thread = None
+
+    def __pin(self, channel: int) -> SimPin:
+        if channel not in self.pins:
+            self.pins[channel] = SimPin(channel)
+        return self.pins[channel]
+
+    # RPi.GPIO API
+
+    def setmode(self, mode: int):
+        if self.mode is not None and self.mode != mode:
+            raise ValueError("A different mode has already been set!")
+        self.mode = mode
+
+    def getmode(self) -> int | None:
+        return self.mode
+
+    def setwarnings(self, flag: bool):
+        pass
+
+    def setup(self, channel, direction: int, pull_up_down: int = PUD_OFF, initial: int | None = None):
+        channels = channel if isinstance(channel, (list, tuple)) else [channel]
+        with self.__lock:
+            for number in channels:
+                pin = self.__pin(number)
+                pin.direction = direction
+                pin.pull = pull_up_down
+                if direction == self.OUT:
+                    self.__write(pin, self.LOW if initial is None else int(bool(initial)))
+                elif pin.driven is not None:
+                    pin.level = pin.driven
+                else:
+                    pin.level = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+            for matrix in self.matrices:
+                if any(number in matrix.col_pins for number in channels):
+                    self.refresh_matrix(matrix)
+
+    def input(self, channel: int) -> int:
+        return self.__pin(channel).level
+
+    def output(self, channel, value):
+        channels = channel if isinstance(channel, (list, tuple)) else [channel]
+        values = value if isinstance(value, (list, tuple)) else [value] * len(channels)
+        with self.__lock:
+            for number, level in zip(channels, values):
+                pin = self.__pin(number)
+                if pin.direction != self.OUT:
+                    raise RuntimeError(f"The GPIO channel {number} has not been set up as an OUTPUT")
+                self.__write(pin, int(bool(level)))
+
+    def add_event_detect(self, channel: int, edge: int, callback=None, bouncetime: int | None = None):
+        with self.__lock:
+            pin = self.__pin(channel)
+            if pin.edge is not None:
+                raise RuntimeError(f"Conflicting edge detection already enabled for GPIO channel {channel}")
+            pin.edge = edge
+            pin.bouncetime = (bouncetime or 0) / 1000
+            pin.callbacks = [callback] if callback else []
+
+            if self.__event_thread is None:
+                self.__event_thread = threading.Thread(target=self.__run_events, name="SimGPIOEvents", daemon=True)
+                self.__event_thread.start()
+
+    def add_event_callback(self, channel: int, callback):
+        with self.__lock:
+            self.__pin(channel).callbacks.append(callback)
+
+    def remove_event_detect(self, channel: int):
+        with self.__lock:
+            pin = self.__pin(channel)
+            pin.edge = None
+            pin.callbacks = []
+
+    def read_bank(self) -> int:
+        # every level as one bitmask (bit n = GPIO n), like a read of the GPLEV registers
+        with self.__lock:
+            return sum(1 << number for number, pin in self.pins.items() if pin.level)
+
+    def cleanup(self, channel=None):
+        with self.__lock:
+            if channel is None:
+                self.pins.clear()
+                self.mode = None
+            else:
+                for number in channel if isinstance(channel, (list, tuple)) else [channel]:
+                    self.pins.pop(number, None)
+
+    # Simulation API
+
+    def __write(self, pin: SimPin, level: int):
+        if pin.level != level:
+            self.output_log.append((time.monotonic_ns(), pin.number, level))
+        pin.level = level
+
+        for matrix in self.matrices:
+            if pin.number in matrix.row_pins:
+                self.refresh_matrix(matrix)
+
+    def __set_input(self, pin: SimPin, level: int):
+        if pin.level == level:
+            return
+        pin.level = level
+        timestamp = time.monotonic_ns()
+        self.edge_log.append((timestamp, pin.number, level))
+
+        if pin.edge is None:
+            return
+        if pin.edge == self.RISING and not level or pin.edge == self.FALLING and level:
+            return
+        self.__events.put((pin.number, timestamp))
+
+    def inject(self, channel: int, level: bool):
+        with self.__lock:
+            pin = self.__pin(channel)
+            level = int(bool(level))
+            pin.driven = level
+            self.__set_input(pin, level)
+
+    def attach_matrix(self, keys: list[list[str]], row_pins: list[int], col_pins: list[int]) -> SimMatrix:
+        matrix = SimMatrix(self, keys, row_pins, col_pins)
+        with self.__lock:
+            self.matrices.append(matrix)
+            self.refresh_matrix(matrix)
+        return matrix
+
+    def refresh_matrix(self, matrix: SimMatrix):
+        with self.__lock:
+            rows = [self.pins.get(number) for number in matrix.row_pins]
+            row_levels = [pin.level if pin is not None and pin.direction == self.OUT else None for pin in rows]
+            for number, level in zip(matrix.col_pins, matrix.column_levels(row_levels)):
+                pin = self.__pin(number)
+                if level is None:
+                    level = self.HIGH if pin.pull == self.PUD_UP else self.LOW
+                self.__set_input(pin, level)
+
+    def play(self, script: list[tuple[float, int, bool]], speed: float = 1.0, block: bool = True) -> threading.Thread:
+        # script entries are (seconds from start, pin, level)
+        def run():
+            start = time.monotonic()
+            for at, channel, level in sorted(script, key=lambda step: step[0]):
+                delay = start + at / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.inject(channel, level)
+
+        thread = threading.Thread(target=run, name="SimGPIOScript", daemon=True)
+        thread.start()
+        if block:
+            thread.join()
+        return thread
+
+    def storm(self, pins: list[int], count: int, rate: float = 1000, bounce: int = 0, seed: int | None = None, block: bool = True) -> threading.Thread:
+        # Random edges across `pins` at roughly `rate` edges per second, each optionally followed
+        # by `bounce` extra chatter edges a few hundred microseconds apart
+        rng = random.Random(seed)
+        script = []
+        at = 0.0
+        for _ in range(count):
+            at += rng.expovariate(rate)
+            channel = rng.choice(pins)
+            level = rng.random() < 0.5
+            for chatter in range(bounce * 2, 0, -1):
+                script.append((at, channel, level if chatter % 2 else not level))
+                at += rng.uniform(0.0001, 0.0005)
+            script.append((at, channel, level))
+        return self.play(script, block=block)
+
+    def __run_events(self):
+        while True:
+            channel, timestamp = self.__events.get()
+            with self.__lock:
+                pin = self.pins.get(channel)
+                if pin is None or pin.edge is None:
+                    continue
+                now = time.monotonic()
+                if now - pin.last_event < pin.bouncetime:
+                    continue
+                pin.last_event = now
+                callbacks = list(pin.callbacks)
+
+            for callback in callbacks:
+                try:
+                    callback(channel)
+                except Exception as e:
+                    logging.error("SIM - GPIO callback for channel %s failed: %s", channel, e)
+
+
+class SimKeypad():
+    # Virtual 4x3 keypad with the pad4pi keypad interface; press() delivers the key to the
+    # registered handlers on the keypad's own thread, as pad4pi does
+    def __init__(self, keypad: list[list[str]], row_pins: list[int], col_pins: list[int]):
+        self.keypad = keypad
+        self.row_pins = row_pins
+        self.col_pins = col_pins
+        self.handlers:list = []
+        self.press_log:collections.deque = collections.deque(maxlen=10_000)
+
+        self.__keys:queue.SimpleQueue = queue.SimpleQueue()
+        self.__thread = threading.Thread(target=self.__run, name="SimKeypad", daemon=True)
+        self.__thread.start()
+
+    def registerKeyPressHandler(self, handler):
+        self.handlers.append(handler)
+
+    def unregisterKeyPressHandler(self, handler):
+        self.handlers.remove(handler)
+
+    def clearKeyPressHandlers(self):
+        self.handlers = []
+
+    def cleanup(self):
+        # pad4pi's cleanup() resets every channel, not just the keypad's
+        self.clearKeyPressHandlers()
+        GPIO.cleanup()
+
+    def press(self, key: str):
+        if not any(key in row for row in self.keypad):
+            raise ValueError(f"Key {key!r} is not on the keypad")
+        timestamp = time.monotonic_ns()
+        self.press_log.append((timestamp, key))
+        self.__keys.put(key)
+
+    def type(self, keys: str, interval: float = 0):
+        for key in keys:
+            self.press(key)
+            if interval:
+                time.sleep(interval)
+
+    def __run(self):
+        while True:
+            key = self.__keys.get()
+            for handler in list(self.handlers):
+                try:
+                    handler(key)
+                except Exception as e:
+                    logging.error("SIM - Keypad handler failed for key %r: %s", key, e)
+
+
+class SimKeypadFactory():
+    keypads:list[SimKeypad] = []
+
+    def create_keypad(self, keypad: list[list[str]] | None = None, row_pins: list[int] | None = None, col_pins: list[int] | None = None, **kwargs) -> SimKeypad:
+        created = SimKeypad(keypad or [["1", "2", "3"], ["4", "5", "6"], ["7", "8", "9"], ["*", "0", "#"]], row_pins or [], col_pins or [])
+        SimKeypadFactory.keypads.append(created)
+        return created
+
+
+class SimCharLCD():
+    # In-memory character LCD with the RPLCD CharLCD interface. `cells` is the visible screen;
+    # `write_log` records every write/command with a timestamp and the bytes it would have put
+    # on the bus (one per character or command), so display code can be profiled off-device.
+    def __init__(self, i2c_expander: str = "PCF8574", address: int = 0x27, port: int = 1, cols: int = 20, rows: int = 4, auto_linebreaks: bool = True, **kwargs):
+        self.i2c_expander = i2c_expander
+        self.address = address
+        self.cols = cols
+        self.rows = rows
+        self.auto_linebreaks = auto_linebreaks
+
+        self.cells:list[list[str]] = [[" "] * cols for _ in range(rows)]
+        self.write_log:collections.deque = collections.deque(maxlen=100_000)
+        self.bytes_sent:int = 0
+        self.__cursor = (0, 0)
+
+    def __command(self, kind: str, payload: str = "", size: int = 1):
+        self.bytes_sent += size
+        self.write_log.append((time.monotonic_ns(), kind, payload, size))
+
+    @property
+    def cursor_pos(self) -> tuple[int, int]:
+        return self.__cursor
+
+    @cursor_pos.setter
+    def cursor_pos(self, value: tuple[int, int]):
+        row, col = value
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            raise ValueError(f"Cursor position {value} is outside the {self.cols}x{self.rows} display")
+        self.__cursor = (row, col)
+        self.__command("cursor", f"{row},{col}")
+
+    def clear(self):
+        self.cells = [[" "] * self.cols for _ in range(self.rows)]
+        self.__cursor = (0, 0)
+        self.__command("clear")
+
+    def home(self):
+        self.__cursor = (0, 0)
+        self.__command("home")
+
+    def write_string(self, value: str):
+        row, col = self.__cursor
+        for char in value:
+            if char == "\n":
+                row = (row + 1) % self.rows
+                continue
+            if char == "\r":
+                col = 0
+                continue
+
+            self.cells[row][col] = char
+            self.__command("write", char)
+            col += 1
+            if col >= self.cols:
+                col = 0
+                if self.auto_linebreaks:
+                    row = (row + 1) % self.rows
+        self.__cursor = (row, col)
+
+    def close(self, clear: bool = False):
+        if clear:
+            self.clear()
+
+    @property
+    def lines(self) -> list[str]:
+        return ["".join(row) for row in self.cells]
+
+    def __str__(self):
+        return "\n".join(self.lines)
+
+
+class LossyUDPRelay():
+    # Local stand-in for a busy show network: forwards every datagram received on `port` to
+    # `target`, dropping, duplicating and delaying them at the given rates. Put one in each
+    # direction to exercise OSC retransmits, acks and receive deduplication, as
+    # benchmarks/bench_reliable.py does.
+    def __init__(self, target: tuple[str, int], port: int = 0, loss: float = 0.2, duplicate: float = 0.05,
+                 delay: tuple[float, float] = (0, 0.005), seed: int | None = None):
+        self.target = target
+        self.loss = loss
+        self.duplicate = duplicate
+        self.delay = delay
+        self.stats:collections.Counter = collections.Counter()
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", port))
+        self.port:int = self.socket.getsockname()[1]
+
+        self.__random = random.Random(seed)
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__run, name="LossyUDPRelay", daemon=True)
+        self.__thread.start()
+
+    def close(self):
+        self.__closed = True
+        self.socket.close()
+
+    def __forward(self, data: bytes, delay: float):
+        if delay:
+            time.sleep(delay)
+        try:
+            self.socket.sendto(data, self.target)
+        except OSError:
+            pass
+
+    def __run(self):
+        while not self.__closed:
+            try:
+                data = self.socket.recv(65535)
+            except OSError:
+                return
+            self.stats["received"] += 1
+
+            if self.__random.random() < self.loss:
+                self.stats["dropped"] += 1
+                continue
+            copies = 2 if self.__random.random() < self.duplicate else 1
+            self.stats["forwarded"] += copies
+            self.stats["duplicated"] += copies - 1
+            for _ in range(copies):
+                delay = self.__random.uniform(*self.delay)
+                if delay:
+                    threading.Thread(target=self.__forward, args=(data, delay), daemon=True).start()
+                else:
+                    self.__forward(data, 0)
+
+
+GPIO = SimGPIO()
+KeypadFactory = SimKeypadFactory
+CharLCD = SimCharLCD
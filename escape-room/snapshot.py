@@ -0,0 +1,82 @@
+import json, logging, mmap, os, struct, threading, time, zlib
+
+# Puzzle state that survives a crash or a supervised restart. The file holds two fixed-size
+# slots; each save goes to the slot that does not hold the newest state, payload first and the
+# header (sequence number, length, crc32) last. A save torn half way leaves a slot that fails
+# its crc, and load() falls back to the other one.
+#
+# The default location is /dev/shm, which survives the process but not a reboot, so a power cycle
+# starts the room from scratch.
+
+
+def default_directory() -> str:
+    if os.environ.get("ESCAPEROOM_STATE_DIR"):
+        return os.environ["ESCAPEROOM_STATE_DIR"]
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    import tempfile
+    return tempfile.gettempdir()
+
+
+class Snapshot():
+    MAGIC = b"ERS1"
+    HEADER = struct.Struct("<4sQII") # magic, sequence, payload length, crc32 of the payload
+
+    def __init__(self, name: str, directory: str | None = None, slot_size: int = 512):
+        self.path:str = os.path.join(directory or default_directory(), f"escaperoom-{name}.state")
+        self.slot_size:int = slot_size
+        self.sequence:int = 0
+        self.__last:bytes | None = None
+        self.__lock = threading.Lock()
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != 2 * slot_size:
+                os.ftruncate(fd, 2 * slot_size)
+            self.__map = mmap.mmap(fd, 2 * slot_size)
+        finally:
+            os.close(fd)
+
+    def __read_slot(self, slot: int) -> tuple[int, bytes] | None:
+        offset = slot * self.slot_size
+        magic, sequence, length, crc = self.HEADER.unpack_from(self.__map, offset)
+        if magic != self.MAGIC or length > self.slot_size - self.HEADER.size:
+            return None
+        payload = self.__map[offset + self.HEADER.size:offset + self.HEADER.size + length]
+        if zlib.crc32(payload) != crc:
+            return None
+        return sequence, payload
+
+    def load(self) -> dict | None:
+        started = time.perf_counter()
+        slots = [found for found in (self.__read_slot(0), self.__read_slot(1)) if found is not None]
+        if not slots:
+            return None
+
+        self.sequence, payload = max(slots)
+        self.__last = payload
+        state = json.loads(payload)
+        logging.info("STATE - Restored %s (seq %s) in %.2fms", self.path, self.sequence, (time.perf_counter() - started) * 1000)
+        return state
+
+    def save(self, state: dict):
+        payload = json.dumps(state, separators=(",", ":"), sort_keys=True).encode()
+        if len(payload) > self.slot_size - self.HEADER.size:
+            raise ValueError(f"State snapshot is {len(payload)} bytes, more than the {self.slot_size - self.HEADER.size} byte slot")
+
+        with self.__lock:
+            if payload == self.__last:
+                return
+            self.sequence += 1
+            offset = (self.sequence % 2) * self.slot_size
+            self.__map[offset + self.HEADER.size:offset + self.HEADER.size + len(payload)] = payload
+            self.HEADER.pack_into(self.__map, offset, self.MAGIC, self.sequence, len(payload), zlib.crc32(payload))
+            self.__map.flush()
+            self.__last = payload
+
+    def clear(self):
+        with self.__lock:
+            self.__map[:] = bytes(2 * self.slot_size)
+            self.__map.flush()
+            self.sequence = 0
+            self.__last = None
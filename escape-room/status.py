@@ -0,0 +1,35 @@
+import json, logging, socket, time
+
+HEARTBEAT_ADDRESS = "/escaperoom/heartbeat"
+STARTED = time.monotonic()
+
+
+def serve_status(osc_controller, challenge: str, state, heartbeat_interval: float = 2.0):
+    # Every `heartbeat_interval` seconds broadcasts
+    #   /escaperoom/heartbeat <challenge> <hostname> <rx port> <uptime s> <heartbeat number>
+    # so monitor.py can discover the node, and answers
+    #   /escaperoom/<challenge>/status [token]
+    # with /escaperoom/<challenge>/status/reply <token> <state() as a JSON string>, sent back to
+    # the address the query came from
+    address = f"/escaperoom/{challenge}/status"
+    hostname = socket.gethostname()
+    beats = 0
+
+    def query(client_address, _address: str, *args):
+        token = args[0] if args and isinstance(args[0], int) else 0
+        try:
+            reply = json.dumps(state(), separators=(",", ":"))
+        except Exception as e:
+            logging.error("STATUS - Failed to collect state: %s", e)
+            reply = json.dumps({"error": str(e)})
+        osc_controller.sender.send(f"{address}/reply", [token, reply], target=client_address)
+
+    def heartbeat():
+        nonlocal beats
+        beats += 1
+        osc_controller.sender.send(HEARTBEAT_ADDRESS, [challenge, hostname, osc_controller.rx_port, round(time.monotonic() - STARTED, 1), beats])
+        osc_controller.runtime.call_later(heartbeat_interval, heartbeat)
+
+    osc_controller.add_handler(address, query, needs_reply_address=True)
+    if heartbeat_interval > 0:
+        osc_controller.runtime.call_later(0, heartbeat)
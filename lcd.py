@@ -1,10 +1,17 @@
-from RPLCD.i2c import CharLCD # type: ignore
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "escape-room"))
+
+from hardware import CharLCD
+from display import LCDFramebuffer
 from time import sleep
 
 lcd = CharLCD('PCF8574', 0x20, cols=20, rows=4)
+screen = LCDFramebuffer(lcd, cols=20, rows=4)
 
-lcd.clear()
-
-lcd.write_string("Help!")
-lcd.cursor_pos = (2, 0)
-lcd.write_string("I am stuck inside\n\rthis LCD display :(")
+screen.render([
+    "Help!",
+    "",
+    "I am stuck inside",
+    "this LCD display :(",
+])
+screen.flush()
\ No newline at end of file